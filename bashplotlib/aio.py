@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+asyncio versions of the plotting functions, for use inside async services
+
+    text = await render_hist_async(response.content, bincount=20)
+
+Input may be an async iterable, e.g. the lines or chunks of an HTTP
+response, as well as anything the blocking functions accept. Async
+input is gathered into compact arrays as it arrives, handing control
+back to the event loop regularly: text is parsed on the loop a chunk of
+up to 64KB (about a millisecond) at a time, and larger chunks in the
+executor. The arrays go to the blocking functions as they are, and
+binning and layout then run in an executor (the loop's default thread pool unless one is given), so
+other coroutines keep running while charts are drawn. A
+ProcessPoolExecutor can be passed for CPU parallelism across requests.
+"""
+
+import asyncio
+import io
+import sys
+from array import array
+from functools import partial
+
+from .histogram import render_hist
+from .horizontal_histogram import render_horiz_hist
+from .scatterplot import render_scatter
+
+# hand control back to the event loop after this many items (or parsed values)
+YIELD_EVERY = 4096
+
+# text chunks longer than this are parsed in the executor, not on the event loop
+PARSE_INLINE = 1 << 16
+
+
+def is_async_iterable(f):
+    return hasattr(f, '__aiter__')
+
+
+def parse_numbers(text):
+    """
+    Parse whitespace separated numbers into (values, carry), carry being
+    a number that may be cut off at the end of text
+    """
+    tokens = text.split()
+    carry = ''
+    if tokens and not text[-1].isspace():
+        carry = tokens.pop()
+    return array('d', map(float, tokens)), carry
+
+
+async def collect_numbers(source, executor=None):
+    """
+    Gather the numbers of an async iterable into an array('d')
+
+    Items may be numbers, or str/bytes holding whitespace separated
+    numbers; text may be split at any point, e.g. arbitrary network
+    chunks, as a number cut in two is joined back up. Chunks longer than
+    PARSE_INLINE are parsed in executor.
+    """
+    values = array('d')
+    carry = ''
+    seen = 0
+    async for item in source:
+        if isinstance(item, bytes):
+            item = item.decode()
+        if isinstance(item, str):
+            text = carry + item
+            if len(text) > PARSE_INLINE:
+                chunk, carry = await run_in_executor(executor, parse_numbers, text)
+            else:
+                chunk, carry = parse_numbers(text)
+            values.extend(chunk)
+            seen += max(len(chunk), 1)
+        else:
+            values.append(float(item))
+            seen += 1
+        if seen >= YIELD_EVERY:
+            seen = 0
+            await asyncio.sleep(0)
+    if carry:
+        values.append(float(carry))
+    return values
+
+
+async def collect_items(source):
+    """
+    Gather an async iterable into a list, e.g. rows of text
+    """
+    items = []
+    async for item in source:
+        items.append(item.decode() if isinstance(item, bytes) else item)
+        if len(items) % YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+    return items
+
+
+async def collect_input(f, input_format="text", executor=None):
+    """
+    Turn async input into something the blocking functions can read
+    """
+    if input_format == "text":
+        return await collect_numbers(f, executor)
+    if input_format == "weighted":
+        return await collect_items(f)
+    chunks = []
+    async for chunk in f:
+        chunks.append(chunk)
+    return io.BytesIO(b''.join(chunks))
+
+
+async def run_in_executor(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+async def render_hist_async(f, *args, executor=None, **kwargs):
+    """
+    Make a histogram without blocking the event loop
+
+    Takes the same arguments as histogram.render_hist (f may also be an
+    async iterable), plus:
+        executor -- concurrent.futures executor to render in
+    """
+    if is_async_iterable(f):
+        f = await collect_input(f, kwargs.get("input_format", "text"), executor)
+    return await run_in_executor(executor, render_hist, f, *args, **kwargs)
+
+
+async def plot_hist_async(f, *args, executor=None, **kwargs):
+    """
+    Make a histogram without blocking the event loop and print it
+    """
+    sys.stdout.write(await render_hist_async(f, *args, executor=executor, **kwargs))
+
+
+async def render_horiz_hist_async(f, *args, executor=None, **kwargs):
+    """
+    Make a horizontal histogram without blocking the event loop
+
+    Takes the same arguments as horizontal_histogram.render_horiz_hist
+    (f may also be an async iterable), plus executor.
+    """
+    if is_async_iterable(f):
+        f = await collect_numbers(f, executor)
+    return await run_in_executor(executor, render_horiz_hist, f, *args, **kwargs)
+
+
+async def collect_points(source):
+    """
+    Gather an async iterable of rows or (x, y) pairs
+
+    Returns (rows, xs, ys): the list of text rows, or None and the
+    pairs split into two arrays.
+    """
+    rows, xs, ys = [], array('d'), array('d')
+    seen = 0
+    async for item in source:
+        if isinstance(item, bytes):
+            item = item.decode()
+        if isinstance(item, str):
+            rows.append(item)
+        else:
+            x, y = item
+            xs.append(x)
+            ys.append(y)
+        seen += 1
+        if seen % YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+    if rows:
+        return rows, None, None
+    return None, xs, ys
+
+
+async def render_scatter_async(f, xs, ys, *args, executor=None, **kwargs):
+    """
+    Make a scatterplot without blocking the event loop
+
+    Takes the same arguments as scatterplot.render_scatter, plus
+    executor. f may also be an async iterable of "x,y" rows (a header
+    row and column selection work as usual) or of (x, y) pairs.
+    """
+    if is_async_iterable(f):
+        f, pair_xs, pair_ys = await collect_points(f)
+        if f is None:
+            xs, ys = pair_xs, pair_ys
+    return await run_in_executor(executor, render_scatter, f, xs, ys, *args, **kwargs)
+
+
+async def plot_scatter_async(f, xs, ys, *args, executor=None, **kwargs):
+    """
+    Make a scatterplot without blocking the event loop and print it
+    """
+    print(await render_scatter_async(f, xs, ys, *args, executor=executor, **kwargs))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Single `bashplotlib` command that dispatches to the plot commands
+
+Nothing but sys is imported up front; the module behind the requested
+command is only imported once it is known, so `bashplotlib hist` never
+pays for the scatterplot code and `bashplotlib --help` imports nothing.
+"""
+
+import sys
+
+# command -> (module, description)
+commands = {
+    "hist": ("bashplotlib.histogram", "vertical histogram of a column of numbers"),
+    "hbar": ("bashplotlib.horizontal_histogram", "horizontal histogram of a column of numbers"),
+    "scatter": ("bashplotlib.scatterplot", "scatterplot of x,y coordinates"),
+    "heatmap": ("bashplotlib.heatmap", "heatmap of timestamp,value rows over time"),
+    "serve": ("bashplotlib.server", "keep a plot server running for `bashplotlib client`"),
+    "client": ("bashplotlib.client", "run a plot command on the server, e.g. client hist -f data.txt"),
+}
+
+usage = """usage: bashplotlib <command> [options]
+
+commands:
+%s
+
+run `bashplotlib <command> --help` for the options of a command
+""" % "\n".join("    %-8s %s" % (name, commands[name][1]) for name in sorted(commands))
+
+
+def main(argv=None):
+    """
+    Run the plot command named by the first argument
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or argv[0] in ("-h", "--help"):
+        sys.stdout.write(usage)
+        return 0 if argv else 2
+    name = argv[0]
+    if name not in commands:
+        sys.stderr.write("bashplotlib: unknown command %r\n\n%s" % (name, usage))
+        return 2
+    module = __import__(commands[name][0], fromlist=["main"])
+    return module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
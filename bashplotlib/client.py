@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Thin client for the bashplotlib plot server
+
+    bashplotlib client hist -f data.txt
+    cat data.txt | bashplotlib client hist -b 20
+
+Sends the command line, working directory and stdin to a running
+`bashplotlib serve` and copies the reply to stdout and stderr, exiting
+with the status of the command. When no server is listening (and for
+--follow, which never finishes) the command runs in this process
+instead. Only quick to load modules are imported: the C level _socket
+rather than socket, which alone would take longer than a request.
+"""
+
+import os
+import sys
+import struct
+import _socket as socket
+
+SOCKET_ENV = "BASHPLOTLIB_SOCKET"
+
+# every message is a one byte kind and a payload length, then the payload:
+# a = request (cwd and argv, NUL separated), o = stdout, e = stderr, x = exit status
+FRAME = struct.Struct('>cI')
+
+
+def socket_path(path=None):
+    """
+    Path of the server socket: path, $BASHPLOTLIB_SOCKET or a per-user default
+    """
+    if path:
+        return path
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    return os.path.join(os.environ.get("TMPDIR", "/tmp"), "bashplotlib-%d.sock" % os.getuid())
+
+
+def write_frame(sock, kind, data):
+    sock.sendall(FRAME.pack(kind, len(data)) + data)
+
+
+def read_exact(rfile, size):
+    data = b''
+    while len(data) < size:
+        chunk = rfile.read(size - len(data))
+        if not chunk:
+            raise EOFError("connection closed mid-message")
+        data += chunk
+    return data
+
+
+def read_frame(rfile):
+    """
+    Read one (kind, payload) message, or (None, None) at the end of the stream
+    """
+    header = rfile.read(FRAME.size)
+    if not header:
+        return None, None
+    if len(header) < FRAME.size:
+        header += read_exact(rfile, FRAME.size - len(header))
+    kind, size = FRAME.unpack(header)
+    return kind, read_exact(rfile, size)
+
+
+class SocketReader(object):
+    """
+    Minimal read(size) on top of a socket, for read_frame
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def read(self, size):
+        return self.sock.recv(size)
+
+
+def connect(path=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path(path))
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+
+def send_input(sock, stdin):
+    """
+    Copy stdin to the server as it arrives, then close the sending side
+
+    Real files are read by descriptor so that a sender still waiting for
+    input holds no stream lock when the interpreter exits.
+    """
+    try:
+        fd = stdin.fileno()
+    except Exception:
+        read = stdin.read1
+    else:
+        read = lambda size: os.read(fd, size)
+    try:
+        while True:
+            data = read(1 << 16)
+            if not data:
+                break
+            sock.sendall(data)
+        sock.shutdown(socket.SHUT_WR)
+    except socket.error:
+        # the server stops reading once the command is done with stdin
+        pass
+
+
+def request(sock, argv, stdin=None, stdout=None, stderr=None):
+    """
+    Run a command on the server over a connected socket
+
+    stdin is a binary stream (only read when it is not a terminal);
+    stdout and stderr are binary streams for the reply. Returns the exit
+    status of the command.
+    """
+    stdout = sys.stdout.buffer if stdout is None else stdout
+    stderr = sys.stderr.buffer if stderr is None else stderr
+    write_frame(sock, b'a', "\0".join([os.getcwd()] + list(argv)).encode())
+
+    if stdin is not None and not stdin.isatty():
+        import threading
+        sender = threading.Thread(target=send_input, args=(sock, stdin))
+        sender.daemon = True
+        sender.start()
+    else:
+        sock.shutdown(socket.SHUT_WR)
+
+    status = 1
+    rfile = SocketReader(sock)
+    try:
+        while True:
+            kind, data = read_frame(rfile)
+            if kind is None:
+                break
+            if kind == b'o':
+                stdout.write(data)
+                stdout.flush()
+            elif kind == b'e':
+                stderr.write(data)
+                stderr.flush()
+            elif kind == b'x':
+                status = int(data)
+    finally:
+        sock.close()
+    return status
+
+
+def main(argv=None):
+    """
+    Run a plot command through the server, or locally when there is none
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    path = None
+    if argv[:1] == ["--socket"] and len(argv) > 1:
+        path, argv = argv[1], argv[2:]
+
+    sock = None
+    if "--follow" not in argv:
+        try:
+            sock = connect(path)
+        except socket.error:
+            pass
+    if sock is None:
+        from .cli import main as run_local
+        return run_local(argv)
+    return request(sock, argv, sys.stdin.buffer)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Plotting terminal based heatmaps of timestamped values
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import math
+from array import array
+from datetime import datetime, timezone
+from .utils.helpers import *
+from .utils.commandhelp import CommandParser, heatmap
+from .histogram import summary_lines
+from .utils.binning import AdaptiveGrid
+from .utils.readers import column_key, first_row, group_columns, iter_column_chunks, iter_pair_chunks
+from .utils.stats import RunningStats
+
+# colours of the "heat" palette, from the emptiest cells to the fullest
+heat_colours = ("blue", "aqua", "green", "yellow", "red")
+
+# timestamps above this are taken as seconds since the epoch and labelled as times
+EPOCH_MIN = 1e8
+
+
+def parse_time(text):
+    """
+    Seconds since the epoch of a number or an ISO 8601 date and time
+
+    Dates and times without a timezone are taken as UTC.
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    text = text.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    stamp = datetime.fromisoformat(text)
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+def format_time(t, span=0):
+    """
+    Label a timestamp, as a UTC time of day (or date and time) for epoch seconds
+    """
+    if t < EPOCH_MIN:
+        return "%g" % t
+    stamp = datetime.fromtimestamp(t, timezone.utc)
+    return stamp.strftime("%H:%M:%S" if span < 86400 else "%Y-%m-%d %H:%M")
+
+
+def iter_timed_chunks(f, timecol=0, valuecol=1, delimiter=','):
+    """
+    Stream a path or iterable of "timestamp,value" rows as (ts, vs) chunks
+
+    Files with numeric timestamps are read in memory-mapped blocks,
+    starting past the header if there is one; dates are parsed row by row.
+    """
+    if not isinstance(f, str):
+        for chunk in iter_pair_chunks(f, timecol, valuecol, delimiter, parse_time):
+            yield chunk
+        return
+
+    fields, offset = first_row(f, delimiter)
+    if not fields:
+        return
+    ti, vi, header = group_columns(fields, timecol, valuecol)
+    if header:
+        with open(f) as fh:
+            rows = (line for line in fh if line.strip())
+            next(rows)
+            row = next(rows, None)
+        if row is None:
+            return
+        fields = row.split(delimiter)
+    if not is_number(fields[ti]):
+        with open(f) as fh:
+            for chunk in iter_pair_chunks(fh, timecol, valuecol, delimiter, parse_time):
+                yield chunk
+        return
+    for ts, vs in iter_column_chunks(f, (ti, vi), delimiter, start=offset if header else 0):
+        yield ts, vs
+
+
+def is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def finite_pairs(ts, vs):
+    """
+    Drop the (t, v) pairs of a chunk where either is nan or infinite
+    """
+    if math.isfinite(sum(ts)) and math.isfinite(sum(vs)):
+        return ts, vs
+    isfinite = math.isfinite
+    keep = [k for k in range(len(ts)) if isfinite(ts[k]) and isfinite(vs[k])]
+    return array('d', [ts[k] for k in keep]), array('d', [vs[k] for k in keep])
+
+
+def heat_colour(count, max_count):
+    """
+    Pick the heat_colours entry for a cell count, on the log scale of density_char
+    """
+    if count <= 0:
+        return "default"
+    if max_count <= 1:
+        return heat_colours[-1]
+    level = math.log(count) / math.log(max_count)
+    return heat_colours[int(round(level * (len(heat_colours) - 1)))]
+
+
+def build_heatmap(grid, stats, colour="default", title="", xtitle=None, ytitle=None, showSummary=False, ramp=density_ramp):
+    """
+    Lay out an AdaptiveGrid of (time, value) counts as a heatmap
+
+    Time runs left to right and values bottom to top; only the columns
+    and rows holding points are drawn. Every cell shows the ramp
+    character for its count, coloured by count too with colour="heat".
+    """
+    span = grid.span()
+    if span is None:
+        raise NoDataError("no points to plot")
+    (c0, c1), (r0, r1) = span
+    columns = grid.counts[c0:c1 + 1]
+    max_count = max(max(column[r0:r1 + 1]) for column in columns)
+
+    ylabs = ["%.4g" % (grid.y_lo + (j + 1) * grid.y_width) for j in range(r0, r1 + 1)]
+    nlen = max(len(ylab) for ylab in ylabs) + 1
+    width = c1 - c0 + 1
+
+    frame = []
+    if title:
+        frame.append(box_text([title], max(width, len(title)), nlen) + "\n")
+    frame.append("\n")
+
+    if ytitle:
+        frame.append(" " + "y: " + ytitle + "\n\n")
+
+    for j in range(r1, r0 - 1, -1):
+        cells = []
+        for column in columns:
+            count = column[j]
+            cell_colour = heat_colour(count, max_count) if colour == "heat" else colour
+            cells.append((density_char(count, max_count, ramp), cell_colour))
+        ylab = ylabs[j - r0]
+        frame.append(" " * (nlen - len(ylab)) + ylab + "|" + colour_runs(cells) + "\n")
+
+    indent = " " * (nlen + 1)
+    frame.append(indent + "-" * width + "\n")
+
+    t_min, t_max = grid.bounds[0], grid.bounds[1]
+    first, last = format_time(t_min, t_max - t_min), format_time(t_max, t_max - t_min)
+    if len(first) + len(last) + 1 <= width:
+        frame.append(indent + first + " " * (width - len(first) - len(last)) + last + "\n")
+    else:
+        frame.append(indent + first + " - " + last + "\n")
+    if xtitle:
+        full_title = "x: " + xtitle
+        frame.append(" " * ((nlen + 1) + width - len(full_title)) + full_title + "\n")
+
+    if showSummary:
+        frame.append("\n")
+        box_width = max(width, 30)
+        frame.append(box_text(["Summary"], box_width, nlen) + "\n")
+        summary = summary_lines(stats)
+        summary[1:1] = ["from: %s" % format_time(t_min, t_max - t_min),
+                        "to: %s" % format_time(t_max, t_max - t_min)]
+        summary.append("max per cell: %d" % max_count)
+        frame.append(box_text(summary, box_width, nlen) + "\n")
+
+    return "".join(frame)
+
+
+def plot_heatmap(f, width=60, height=20, colour="default", title="", xtitle=None, ytitle=None, showSummary=False, timecol=0, valuecol=1):
+    """
+    Make a heatmap of values over time
+
+    Arguments:
+        f -- comma delimited file (or rows) w/ timestamp,value pairs
+        width -- maximum number of time buckets (columns)
+        height -- maximum number of value bins (rows)
+        colour -- colour of the cells, or "heat" to colour them by count
+        title -- title of the plot
+        xtitle -- x (time) axis title of the plot
+        ytitle -- y (value) axis title of the plot
+        showSummary -- boolean value for whether or not to display a summary
+        timecol -- index or header name of the timestamp column
+        valuecol -- index or header name of the value column
+    """
+    sys.stdout.write(render_heatmap(f, width, height, colour, title, xtitle, ytitle,
+                                    showSummary, timecol, valuecol))
+
+
+def render_heatmap(f, width=60, height=20, colour="default", title="", xtitle=None, ytitle=None, showSummary=False, timecol=0, valuecol=1, out=None):
+    """
+    Make a heatmap and return it as a string instead of printing it
+
+    The input is read once, in chunks, into a grid of at most width x
+    height counters whose time and value ranges grow as needed, so memory
+    does not depend on the number of rows. Timestamps are seconds since
+    the epoch (or any number) or ISO 8601 dates; rows where either column
+    is nan or infinite are skipped.
+
+    Takes the same arguments as plot_heatmap, plus:
+        out -- optional file-like object the plot is also written to
+    """
+    grid = AdaptiveGrid(width, height)
+    stats = RunningStats()
+    for ts, vs in iter_timed_chunks(f, timecol, valuecol):
+        ts, vs = finite_pairs(ts, vs)
+        grid.extend(ts, vs)
+        stats.extend(vs)
+    text = build_heatmap(grid, stats, colour, title, xtitle, ytitle, showSummary)
+    if out is not None:
+        out.write(text)
+    return text
+
+
+def parse_args(argv=None, out=None, err=None, cwd=None):
+    """
+    Parse the heatmap command line into (opts, args)
+    """
+    parser = CommandParser(usage=heatmap['usage'], prog='heatmap', out=out, err=err, cwd=cwd)
+
+    parser.add_option('-f', '--file', help='a csv w/ timestamp and value columns', default=None, type='path', dest='f')
+    parser.add_option('-t', '--title', help='title for the chart', default="", dest='t')
+    parser.add_option('-W', '--width', help='maximum number of time buckets', type='int', default=60, dest='width')
+    parser.add_option('-s', '--height', help='maximum number of value bins', type='int', default=20, dest='height')
+    parser.add_option('-c', '--colour', help='colour of the plot (%s, or heat to colour by count)' %
+                      colour_help, default='default', dest='colour')
+    parser.add_option('--xtitle', help='title for x (time) axis', default=None, dest='h')
+    parser.add_option('--ytitle', help='title for y (value) axis', default=None, dest='v')
+    parser.add_option('-n', '--nosummary', help='hide summary',
+                      action='store_false', dest='showSummary', default=True)
+    parser.add_option('--timecol', help='index or header name of the timestamp column',
+                      default='0', dest='timecol')
+    parser.add_option('--valuecol', help='index or header name of the value column',
+                      default='1', dest='valuecol')
+
+    return parser.parse_args(argv)
+
+
+def run(argv=None, stdin=None, out=None, err=None, cwd=None):
+    """
+    Run the heatmap command, reading stdin and writing to out when given
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    out = sys.stdout if out is None else out
+    opts, args = parse_args(argv, out, err, cwd)
+
+    if opts.f is None:
+        opts.f = args[0] if args else stdin
+
+    if opts.f:
+        try:
+            render_heatmap(opts.f, opts.width, opts.height, opts.colour, opts.t, opts.h, opts.v,
+                           opts.showSummary, column_key(opts.timecol), column_key(opts.valuecol), out=out)
+        except NoDataError:
+            out.write("nothing to plot!\n")
+    else:
+        out.write("nothing to plot!\n")
+
+
+def main(argv=None):
+    return run(argv)
+
+
+if __name__ == "__main__":
+    main()
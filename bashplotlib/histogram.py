@@ -8,19 +8,40 @@ Plotting terminal based histograms
 from __future__ import print_function
 from __future__ import division
 
+import io
 import os
 import sys
 import math
-import optparse
+import time
+from array import array
+from itertools import chain, islice, repeat
 from os.path import dirname
 from .utils.helpers import *
-from .utils.commandhelp import hist
+from .utils.commandhelp import CommandParser, hist
+from .utils import backend as numpy_backend
+from .utils.backend import backend_help, backends, resolve_backend
+from .utils.cache import get_cache
+from .utils.export import dumps, output_format_help, output_formats
+from .utils.binning import AdaptiveHistogram, bin_numbers, bin_weighted
+from .utils.readers import (column_key, input_format_help, input_formats, iter_binary_chunks,
+                            iter_number_chunks, iter_weighted_chunks, read_groups, split_ranges)
+from .utils.sampling import Reservoir
+from .utils.sketch import DDSketch, load_sketches
+from .utils.stats import RunningStats, default_percentiles, parse_percentiles, percentile_label, quantiles
+
+
+# series styles: plot characters and colours from helpers.bcolours
+series_pchs = "ox+*#@%"
+series_colours = ("blue", "red", "green", "yellow", "pink", "aqua", "white", "grey")
+series_layouts = ("overlay", "multiples")
 
 
 def calc_bins(n, min_val, max_val, h=None, binwidth=None):
     """
     Calculate number of bins for the histogram
     """
+    if not n:
+        raise NoDataError("no values to plot")
     if not h:
         h = max(10, math.log(n + 1, 2))
     if binwidth == 0:
@@ -37,20 +58,429 @@ def calc_bins(n, min_val, max_val, h=None, binwidth=None):
 def read_numbers(numbers):
     """
     Read the input data in the most optimal way
+
+    numbers is a path, or an iterable of numbers or lines of text (float
+    takes care of the surrounding whitespace).
+    """
+    if isinstance(numbers, str):
+        return chain.from_iterable(iter_number_chunks(numbers))
+    return map(float, numbers)
+
+
+def number_block(f):
+    """
+    f as an array('d') to count as it is, or None if it may hold text
+
+    Arrays, numpy arrays and lists or tuples of numbers are converted in
+    one go (float arrays are used as they are), so values already in
+    memory are never parsed.
     """
-    if isiterable(numbers):
-        for number in numbers:
-            yield float(str(number).strip())
+    if isinstance(f, array) and f.typecode == 'd':
+        return f
+    if hasattr(f, 'dtype') and hasattr(f, 'tolist'):
+        return array('d', f.ravel().tolist()) if f.dtype.kind in 'biuf' else None
+    if isinstance(f, (list, tuple, array)):
+        try:
+            return array('d', f)
+        except TypeError:
+            # lines of text
+            return None
+    return None
+
+
+def number_chunks(f, input_format="text"):
+    """
+    Return a function that yields the input as blocks of numbers
+
+    Every call starts again from the beginning, so the input can be read
+    once per pass: paths are re-read, sequences re-iterated and one-shot
+    iterators (generators, open files, stdin) buffered as a compact array
+    of floats on the way in.
+    """
+    if isinstance(f, str):
+        if input_format == "text":
+            return lambda: iter_number_chunks(f)
+        return lambda: iter_binary_chunks(f, input_format)
+    if input_format == "text" and iter(f) is not f:
+        block = number_block(f)
+        if block is not None:
+            return lambda: iter([block])
+        return lambda: iter([read_numbers(f)])
+    numbers = array('d')
+    if input_format == "text":
+        numbers.extend(read_numbers(f))
     else:
-        with open(numbers) as fh:
-            for number in fh:
-                yield float(number.strip())
+        for chunk in iter_binary_chunks(f, input_format):
+            numbers.extend(chunk)
+    return lambda: iter([numbers])
 
 
-def run_demo():
+def weighted_chunks(f):
+    """
+    Return a function that yields the input as (values, weights) blocks
+
+    Like number_chunks, for "value,weight" rows or (value, weight) pairs.
+    """
+    if isinstance(f, str) or iter(f) is not f:
+        return lambda: iter_weighted_chunks(f)
+    chunks = list(iter_weighted_chunks(f))
+    return lambda: iter(chunks)
+
+
+def sketch_input(sketch, f, input_format="text"):
+    """
+    Add the values of an input in any of the input formats to a sketch
+    """
+    if input_format == "weighted":
+        for values, weights in weighted_chunks(f)():
+            sketch.extend_weighted(values, weights)
+    else:
+        for chunk in number_chunks(f, input_format)():
+            sketch.extend(chunk)
+    return sketch
+
+
+def percentile_values(values, percentiles):
+    """
+    [(p, value), ...] for percentiles (0-100) of an array, ndarray or DDSketch
+
+    Arrays are exact, by selection; a sketch answers within its relative
+    accuracy.
+    """
+    qs = [p / 100 for p in percentiles]
+    if isinstance(values, DDSketch):
+        found = [values.quantile(q) for q in qs]
+    elif isinstance(values, (array, list)):
+        found = quantiles(values, qs)
+    else:
+        found = numpy_backend.quantiles(values, qs)
+    return list(zip(percentiles, found))
+
+
+def percentile_store(percentiles, accuracy=None):
+    """
+    Where values are kept for their percentiles: an array for exact ones,
+    a DDSketch of the given relative accuracy in bounded memory, or None
+    when no percentiles are wanted
+    """
+    if not percentiles:
+        return None
+    return DDSketch(accuracy) if accuracy else array('d')
+
+
+def histogram_counts(f, bincount=None, binwidth=None, backend="python", sketch=None, jobs=None, input_format="text", sample=None, seed=None, percentiles=None, accuracy=None):
+    """
+    Calculate the bins, bin counts and summary statistics for the input
+
+    The input is parsed at most twice: once to accumulate the summary
+    statistics and once to bin the values. File paths are streamed in
+    memory-mapped chunks and sequences are simply re-read for the second
+    pass; one-shot iterators (generators, open files, stdin) are buffered
+    as a compact array of floats.
+
+    input_format is one of "text" (a number per line), "weighted"
+    ("value,weight" rows, e.g. pre-aggregated "latency,count" data),
+    "f64"/"f32" (raw little-endian floats) or "npy" (a saved numpy array).
+
+    With backend="numpy" (or "auto" when numpy is installed) the input is
+    bulk parsed into an ndarray and binned with vectorised operations.
+
+    With sketch=True (or an existing DDSketch to add to) the input is read
+    once into a fixed-memory sketch and the bin counts are approximated
+    from it; f may be None to plot an existing sketch as is.
+
+    With jobs set, f is a path, glob or list of them that is read by that
+    many worker processes (0 for one per core), see histogram_counts_files.
+
+    With sample set, the counts come from a reservoir sample of that many
+    values, see sampled_histogram_counts.
+
+    With percentiles, a list like [50, 90, 99, 99.9] (or True for those),
+    stats.percentiles holds [(p, value), ...]. They are exact, found by
+    selection on the values kept in a compact array, unless accuracy is
+    given: then the values stream through a DDSketch of that relative
+    accuracy instead, in bounded memory. A sketch or weighted input always
+    gives approximate percentiles, and a sample those of the sample.
+
+    Returns a (bins, hist, stats) tuple where stats is a RunningStats.
+    """
+    if input_format not in input_formats:
+        raise ValueError("unknown input format %r (expected one of %s)" % (input_format, input_format_help))
+
+    if percentiles is True:
+        percentiles = default_percentiles
+
+    if sample:
+        if jobs is not None or sketch or input_format == "weighted":
+            raise ValueError("sampling reads unweighted values, without a sketch or worker processes")
+        return sampled_histogram_counts(f, bincount, binwidth, sample, seed, input_format, percentiles)
+
+    if jobs is not None:
+        if input_format != "text":
+            raise ValueError("worker processes only read text input")
+        if backend == "numpy":
+            raise ValueError("worker processes only use the python backend")
+        if percentiles:
+            raise ValueError("percentiles are not computed with worker processes")
+        return histogram_counts_files(f, bincount, binwidth, jobs or None)
+
+    if sketch is not None and sketch is not False:
+        if not isinstance(sketch, DDSketch):
+            sketch = DDSketch(accuracy) if accuracy else DDSketch()
+        if f is not None:
+            sketch_input(sketch, f, input_format)
+        stats = sketch.stats
+        bins = list(calc_bins(stats.n, stats.min_val, stats.max_val, bincount, binwidth))
+        if percentiles:
+            stats.percentiles = percentile_values(sketch, percentiles)
+        return bins, sketch.histogram(bins), stats
+
+    if input_format == "weighted":
+        return weighted_histogram_counts(f, bincount, binwidth, percentiles, accuracy)
+
+    if resolve_backend(backend) == "numpy":
+        values = numpy_backend.load_numbers(f, input_format)
+        bins, hist, stats = numpy_backend.histogram_counts(values, calc_bins, bincount, binwidth)
+        if percentiles:
+            source = values
+            if accuracy:
+                source = DDSketch(accuracy)
+                source.extend(values.tolist())
+            stats.percentiles = percentile_values(source, percentiles)
+        return bins, hist, stats
+
+    chunks = number_chunks(f, input_format)
+    stats = RunningStats()
+    store = percentile_store(percentiles, accuracy)
+    for chunk in chunks():
+        if store is not None:
+            # sequences come through as a generator, read twice here
+            if not isinstance(chunk, array):
+                chunk = array('d', chunk)
+            store.extend(chunk)
+        stats.extend(chunk)
+
+    bins = list(calc_bins(stats.n, stats.min_val, stats.max_val, bincount, binwidth))
+    hist = bin_numbers(chain.from_iterable(chunks()), bins, stats.max_val)
+    if store is not None:
+        stats.percentiles = percentile_values(store, percentiles)
+    return bins, hist, stats
+
+
+def input_percentiles(f, percentiles=default_percentiles, accuracy=None, input_format="text"):
+    """
+    [(p, value), ...] for percentiles (0-100) of an input, without binning it
+
+    The input is streamed once. Exact percentiles keep the values in a
+    compact array and select them; with accuracy they come from a
+    DDSketch of that relative accuracy, in bounded memory. Weighted input
+    always goes through a sketch (1% unless accuracy says otherwise).
+    """
+    if input_format == "weighted":
+        store = DDSketch(accuracy or 0.01)
+        for values, weights in iter_weighted_chunks(f):
+            store.extend_weighted(values, weights)
+    else:
+        store = percentile_store(percentiles, accuracy)
+        for chunk in stream_chunks(f, input_format):
+            store.extend(chunk)
+    return percentile_values(store, percentiles)
+
+
+def cache_key(cache, kind, f, sketch, options, sample=None, seed=None):
+    """
+    Key for a result computed from f, or None when it can't be cached
+
+    Results that add to an existing sketch are never cached, and neither
+    are unseeded samples, which should come out different every time.
+    """
+    if isinstance(sketch, DDSketch) or (sample and seed is None):
+        return None
+    return cache.key(kind, f, options)
+
+
+def cached_histogram_counts(cache, f, bincount=None, binwidth=None, backend="python", sketch=None, jobs=None, input_format="text", sample=None, seed=None, percentiles=None, accuracy=None):
+    """
+    histogram_counts through a RenderCache
+
+    The counts are keyed on the input file and the binning options only,
+    so they are shared by plots that differ in layout or colour, and by
+    the vertical and horizontal histograms.
+    """
+    def compute():
+        bins, hist, stats = histogram_counts(f, bincount, binwidth, backend, sketch, jobs, input_format,
+                                             sample, seed, percentiles, accuracy)
+        return [bins, hist, stats.state()]
+
+    if percentiles is True:
+        percentiles = default_percentiles
+    key = cache_key(cache, "counts", f, sketch, (bincount, binwidth, backend, bool(sketch), jobs, input_format,
+                                                 sample, seed, percentiles and tuple(percentiles), accuracy),
+                    sample, seed)
+    bins, hist, state = cache.lookup(key, compute)
+    return bins, hist, RunningStats.from_state(state)
+
+
+def stream_chunks(f, input_format="text", block=1 << 16):
+    """
+    Yield the input once as blocks of numbers, without buffering all of it
+    """
+    if input_format != "text":
+        return iter_binary_chunks(f, input_format)
+    if isinstance(f, str):
+        return iter_number_chunks(f)
+    numbers = read_numbers(f)
+    return iter(lambda: array('d', islice(numbers, block)), array('d'))
+
+
+def sampled_histogram_counts(f, bincount=None, binwidth=None, sample=10000, seed=None, input_format="text", percentiles=None):
+    """
+    histogram_counts from a reservoir sample of the input
+
+    The input is streamed once. Count, min, max, mean and standard
+    deviation are still exact, and so are the bin edges; the bin counts
+    are those of a uniform sample of at most sample values scaled up to
+    the full count, so binning costs the same however long the input is.
+    Percentiles, when asked for, are those of the sample.
+    """
+    reservoir = Reservoir(sample, seed)
+    stats = RunningStats()
+    for chunk in stream_chunks(f, input_format):
+        stats.extend(chunk)
+        reservoir.extend(chunk)
+
+    bins = list(calc_bins(stats.n, stats.min_val, stats.max_val, bincount, binwidth))
+    values = reservoir.columns[0]
+    hist = bin_numbers(values, bins, stats.max_val)
+    if stats.n > len(values):
+        scale = stats.n / len(values)
+        hist = [int(round(count * scale)) for count in hist]
+    if percentiles:
+        stats.percentiles = percentile_values(values, percentiles)
+    return bins, hist, stats
+
+
+def weighted_histogram_counts(f, bincount=None, binwidth=None, percentiles=None, accuracy=None):
+    """
+    histogram_counts for "value,weight" input
+
+    Each value counts weight times; rows with a weight of zero or less
+    are skipped. Whole-number totals are reported as integers. Percentiles
+    come from a DDSketch of the weighted values (1% relative accuracy
+    unless accuracy says otherwise).
+    """
+    chunks = weighted_chunks(f)
+    stats = RunningStats()
+    sketch = DDSketch(accuracy or 0.01) if percentiles else None
+    for values, weights in chunks():
+        stats.extend_weighted(values, weights)
+        if sketch is not None:
+            sketch.extend_weighted(values, weights)
+
+    bins = list(calc_bins(stats.n, stats.min_val, stats.max_val, bincount, binwidth))
+    pairs = ((x, w) for values, weights in chunks() for x, w in zip(values, weights) if w > 0)
+    hist = [int(c) if float(c).is_integer() else c for c in bin_weighted(pairs, bins, stats.max_val)]
+    if float(stats.n).is_integer():
+        stats.n = int(stats.n)
+    if sketch is not None:
+        stats.percentiles = percentile_values(sketch, percentiles)
+    return bins, hist, stats
+
+
+def series_histogram_counts(series, bincount=None, binwidth=None):
+    """
+    Calculate shared bins and the counts of several named series
+
+    series maps names to anything read as a single column of numbers
+    (paths, sequences, iterables of lines). Each input is parsed once,
+    into a compact array, while its summary statistics are gathered; the
+    bin edges then come from the combined range and every series is
+    counted against them without parsing anything again.
+
+    Returns (bins, [(name, hist, stats), ...], combined stats).
+    """
+    values = []
+    combined = RunningStats()
+    for name, f in series.items():
+        if isinstance(f, array):
+            numbers = f
+        else:
+            numbers = array('d')
+            for chunk in number_chunks(f)():
+                numbers.extend(chunk)
+        stats = RunningStats()
+        stats.extend(numbers)
+        combined.merge(stats)
+        values.append((str(name), numbers, stats))
+    if not combined.n:
+        raise NoDataError("no values to plot")
+
+    bins = list(calc_bins(combined.n, combined.min_val, combined.max_val, bincount, binwidth))
+    counts = [(name, bin_numbers(numbers, bins, combined.max_val), stats) for name, numbers, stats in values]
+    return bins, counts, combined
+
+
+def expand_files(patterns):
+    """
+    Expand glob patterns into a list of files, keeping literal paths as is
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    files = []
+    for pattern in patterns:
+        matches = []
+        if any(c in pattern for c in "*?["):
+            import glob
+            matches = sorted(glob.glob(pattern))
+        files.extend(matches or [pattern])
+    return files
+
+
+def _range_stats(task):
+    path, start, end = task
+    stats = RunningStats()
+    for chunk in iter_number_chunks(path, start=start, end=end):
+        stats.extend(chunk)
+    return stats
+
+
+def _range_counts(task, bins, max_val):
+    path, start, end = task
+    return bin_numbers(chain.from_iterable(iter_number_chunks(path, start=start, end=end)), bins, max_val)
+
+
+def histogram_counts_files(paths, bincount=None, binwidth=None, jobs=None, split_size=1 << 26):
+    """
+    Calculate bins, bin counts and summary statistics over many files
+
+    Files (and glob patterns) are cut into byte ranges of about split_size
+    and handed to a pool of jobs worker processes. Workers first return
+    partial statistics, which are merged to fix the shared bin edges,
+    then partial counts against those edges, which are summed.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = []
+    for path in expand_files(paths):
+        tasks.extend(split_ranges(path, split_size))
+
+    with ProcessPoolExecutor(jobs) as pool:
+        stats = RunningStats()
+        for part in pool.map(_range_stats, tasks):
+            stats.merge(part)
+
+        bins = list(calc_bins(stats.n, stats.min_val, stats.max_val, bincount, binwidth))
+        hist = [0] * len(bins)
+        for part in pool.map(_range_counts, tasks, repeat(bins), repeat(stats.max_val)):
+            hist = [a + b for a, b in zip(hist, part)]
+    return bins, hist, stats
+
+
+def run_demo(out=None):
     """
     Run a demonstration
     """
+    out = sys.stdout if out is None else out
     module_dir = dirname(dirname(os.path.realpath(__file__)))
     demo_file = os.path.join(module_dir, 'examples/data/exp.txt')
 
@@ -60,35 +490,35 @@ def run_demo():
         sys.exit(1)
 
     # plotting a histogram
-    print("plotting a basic histogram")
-    print("plot_hist('%s')" % demo_file)
-    print("hist -f %s" % demo_file)
-    print("cat %s | hist" % demo_file)
-    plot_hist(demo_file)
-    print("*" * 80)
+    print("plotting a basic histogram", file=out)
+    print("plot_hist('%s')" % demo_file, file=out)
+    print("hist -f %s" % demo_file, file=out)
+    print("cat %s | hist" % demo_file, file=out)
+    render_hist(demo_file, out=out)
+    print("*" * 80, file=out)
 
     # with colours
-    print("histogram with colours")
-    print("plot_hist('%s', colour='blue')" % demo_file)
-    print("hist -f %s -c blue" % demo_file)
-    plot_hist(demo_file, colour='blue')
-    print("*" * 80)
+    print("histogram with colours", file=out)
+    print("plot_hist('%s', colour='blue')" % demo_file, file=out)
+    print("hist -f %s -c blue" % demo_file, file=out)
+    render_hist(demo_file, colour='blue', out=out)
+    print("*" * 80, file=out)
 
     # changing the shape of the point
-    print("changing the shape of the bars")
-    print("plot_hist('%s', pch='.')" % demo_file)
-    print("hist -f %s -p ." % demo_file)
-    plot_hist(demo_file, pch='.')
-    print("*" * 80)
+    print("changing the shape of the bars", file=out)
+    print("plot_hist('%s', pch='.')" % demo_file, file=out)
+    print("hist -f %s -p ." % demo_file, file=out)
+    render_hist(demo_file, pch='.', out=out)
+    print("*" * 80, file=out)
 
     # changing the size of the plot
-    print("changing the size of the plot")
-    print("plot_hist('%s', height=35.0, bincount=40)" % demo_file)
-    print("hist -f %s -s 35.0 -b 40" % demo_file)
-    plot_hist(demo_file, height=35.0, bincount=40)
+    print("changing the size of the plot", file=out)
+    print("plot_hist('%s', height=35.0, bincount=40)" % demo_file, file=out)
+    print("hist -f %s -s 35.0 -b 40" % demo_file, file=out)
+    render_hist(demo_file, height=35.0, bincount=40, out=out)
 
 
-def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None):
+def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, backend="python", sketch=None, jobs=None, input_format="text", cache=None, groupcol=None, valuecol=None, layout="overlay", sample=None, seed=None, percentiles=None, accuracy=None):
     """
     Make a histogram
 
@@ -102,46 +532,125 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
         xlab -- boolen value for whether or not to display x-axis labels
         showSummary -- boolean value for whether or not to display a summary
         regular -- boolean value for whether or not to start y-labels at 0
+        backend -- "python", "numpy" or "auto" (numpy falls back to python if missing)
+        sketch -- True or a DDSketch to approximate the counts in fixed memory
+        jobs -- number of worker processes reading f, a path, glob or list of them (0 for one per core)
+        input_format -- "text", "weighted" (value,weight rows), "f64", "f32" or "npy"
+        cache -- True, a directory or a RenderCache to reuse results for unchanged files
+        groupcol -- index or header name of a column naming the series of each row of f
+        valuecol -- index or header name of the value column when groupcol is given
+        layout -- "overlay" or "multiples" (side by side) for several series
+        sample -- bin a reservoir sample of this many values (summary stats stay exact)
+        seed -- random seed for a repeatable sample
+        percentiles -- percentiles (0-100) to add to the summary, or True for p50, p90, p99 and p99.9
+        accuracy -- relative accuracy of approximate percentiles, found in bounded memory (exact if None)
+
+    f may also be a dict of series name -> input (or a csv with groupcol) to
+    compare several series on shared bins; pch and colour may then be lists.
     """
-    if pch is None:
-        pch = "o"
+    sys.stdout.write(render_hist(f, height, bincount, binwidth, pch, colour, title, xlab,
+                                 showSummary, regular, xtitle, ytitle, backend, sketch, jobs,
+                                 input_format, cache, groupcol, valuecol, layout, sample, seed,
+                                 percentiles, accuracy))
 
-    if isinstance(f, str):
-        with open(f) as fh:
-            f = fh.readlines()
 
-    min_val, max_val = None, None
-    n, mean, sd = 0.0, 0.0, 0.0
+def render_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, backend="python", sketch=None, jobs=None, input_format="text", cache=None, groupcol=None, valuecol=None, layout="overlay", sample=None, seed=None, percentiles=None, accuracy=None, out=None):
+    """
+    Make a histogram and return it as a string instead of printing it
+
+    Takes the same arguments as plot_hist, plus:
+        out -- optional file-like object the chart is also written to
+    """
+    if isinstance(f, dict) or groupcol is not None:
+        if sketch or jobs is not None or input_format != "text" or sample or percentiles:
+            raise ValueError("several series are read as text, without a sketch, sample, percentiles or worker processes")
+        return render_series_hist(f, height, bincount, binwidth, pch, colour, title, xlab, showSummary,
+                                  regular, xtitle, ytitle, groupcol, valuecol, layout, cache, out)
+
+    if percentiles is True:
+        percentiles = default_percentiles
+    cache = get_cache(cache)
+    if cache is None:
+        bins, hist, stats = histogram_counts(f, bincount, binwidth, backend, sketch, jobs, input_format,
+                                             sample, seed, percentiles, accuracy)
+        text = format_hist(bins, hist, stats, height, pch, colour, title, xlab,
+                           showSummary, regular, xtitle, ytitle)
+    else:
+        def draw():
+            bins, hist, stats = cached_histogram_counts(cache, f, bincount, binwidth, backend,
+                                                        sketch, jobs, input_format, sample, seed,
+                                                        percentiles, accuracy)
+            return format_hist(bins, hist, stats, height, pch, colour, title, xlab,
+                               showSummary, regular, xtitle, ytitle)
+        key = cache_key(cache, "hist", f, sketch, (
+            height, bincount, binwidth, pch, colour, title, xlab, showSummary, regular,
+            xtitle, ytitle, backend, bool(sketch), jobs, input_format, sample, seed,
+            percentiles and tuple(percentiles), accuracy), sample, seed)
+        text = cache.lookup(key, draw)
+    if out is not None:
+        out.write(text)
+    return text
 
-    for number in read_numbers(f):
-        n += 1
-        if min_val is None or number < min_val:
-            min_val = number
-        if max_val is None or number > max_val:
-            max_val = number
-        mean += number
 
-    mean /= n
+def hist_data(f, bincount=None, binwidth=None, backend="python", sketch=None, jobs=None, input_format="text", cache=None, sample=None, seed=None, percentiles=None, accuracy=None):
+    """
+    The bin edges, counts and summary of a histogram, without drawing it
 
-    for number in read_numbers(f):
-        sd += (mean - number)**2
+    Takes the counting arguments of plot_hist and reads the input the same
+    way, but skips all of the layout. Returns a dict, ready for json, of
+    "bins" (the edges: count i is of the values above bins[i - 1] and up
+    to bins[i]), "counts" and "summary" (see summary_dict).
+    """
+    cache = get_cache(cache)
+    if cache is None:
+        bins, hist, stats = histogram_counts(f, bincount, binwidth, backend, sketch, jobs, input_format,
+                                             sample, seed, percentiles, accuracy)
+    else:
+        bins, hist, stats = cached_histogram_counts(cache, f, bincount, binwidth, backend, sketch, jobs,
+                                                    input_format, sample, seed, percentiles, accuracy)
+    return {"bins": bins, "counts": hist, "summary": summary_dict(stats)}
 
-    sd /= (n - 1)
-    sd **= 0.5
 
-    bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
-    hist = dict((i, 0) for i in range(len(bins)))
+def format_hist_data(data, output_format="json"):
+    """
+    Write out hist_data as "json", or as "csv" rows of bin,count then the summary
+    """
+    return dumps(data, output_format, ["bin", "count"], zip(data["bins"], data["counts"]))
 
-    for number in read_numbers(f):
-        for i, b in enumerate(bins):
-            if number <= b:
-                hist[i] += 1
-                break
-        if number == max_val and max_val > bins[len(bins) - 1]:
-            hist[len(hist) - 1] += 1
 
-    min_y, max_y = min(hist.values()), max(hist.values())
+def render_series_hist(series, height=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, groupcol=None, valuecol=None, layout="overlay", cache=None, out=None):
+    """
+    Make a histogram of several series and return it as a string
+
+    series is a dict of name -> input, or with groupcol a single path or
+    iterable of delimited rows that is split into series by that column.
+    Takes the same arguments as render_hist otherwise.
+    """
+    def draw():
+        named = read_groups(series, groupcol, valuecol) if groupcol is not None else series
+        bins, counts, stats = series_histogram_counts(named, bincount, binwidth)
+        return format_series_hist(bins, counts, stats, height, pch, colour, title, xlab,
+                                  showSummary, regular, xtitle, ytitle, layout)
 
+    cache = get_cache(cache)
+    if cache is None:
+        text = draw()
+    else:
+        names = None if groupcol is not None else list(series)
+        inputs = series if groupcol is not None else list(series.values())
+        key = cache.key("series", inputs, (
+            names, height, bincount, binwidth, pch, colour, title, xlab, showSummary, regular,
+            xtitle, ytitle, groupcol, valuecol, layout))
+        text = cache.lookup(key, draw)
+    if out is not None:
+        out.write(text)
+    return text
+
+
+def y_axis(min_y, max_y, height=20.0, regular=False):
+    """
+    The count of every row of a histogram, top down, and the y-label width
+    """
     start = max(min_y, 1)
     stop = max_y + 1
 
@@ -157,15 +666,14 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
     ys.reverse()
 
     nlen = max(len(str(min_y)), len(str(max_y))) + 1
+    return ys, nlen
 
-    if title:
-        print(box_text([title], max(len(hist) * 2, len(title)), nlen))
-    print()
-
-    if ytitle: 
-        print(" " + "y: "+ ytitle  + "\n")
-        # return_string += "y: "+ ytitle  + "\n"
 
+def y_labels(ys, nlen):
+    """
+    Right-aligned y-axis labels ending in "|", each count labelled once
+    """
+    labels = []
     used_labs = set()
     for y in ys:
         ylab = str(int(y))
@@ -173,67 +681,307 @@ def plot_hist(f, height=20.0, bincount=None, binwidth=None, pch="o", colour="def
             ylab = ""
         else:
             used_labs.add(ylab)
-        ylab = " " * (nlen - len(ylab)) + ylab + "|"
+        labels.append(" " * (nlen - len(ylab)) + ylab + "|")
+    return labels
 
-        print(ylab, end=' ')
 
-        for i in range(len(hist)):
-            if int(y) <= hist[i]:
-                printcolour(pch, True, colour)
+def x_label_rows(bins):
+    """
+    Rows of vertical x-axis labels, one for every other bin
+    """
+    labels = abbreviate([str(b) for b in bins])
+    rows = []
+    for i in range(0, len(labels[0])):
+        row = []
+        for x in range(0, len(labels)):
+            num = labels[x]
+            if x % 2 != 0:
+                pass
+            elif i < len(num):
+                row.append(num[i] + " ")
             else:
-                printcolour(" ", True, colour)
-        print('')
-    xs = hist.keys()
+                row.append("  ")
+        rows.append("".join(row))
+    return rows
 
-    print(" " * (nlen + 1) + "-" * len(xs))
+
+def summary_lines(stats):
+    """
+    Lines of the summary box for a RunningStats, with any percentiles last
+    """
+    lines = ["observations: %d" % stats.n, "min value: %f" % stats.min_val,
+             "mean : %f" % stats.mean, "std dev : %f" % stats.sd, "max value: %f" % stats.max_val]
+    for p, value in stats.percentiles or ():
+        lines.append("%s: %f" % (percentile_label(p), value))
+    return lines
+
+
+def summary_dict(stats):
+    """
+    The summary of a RunningStats as a flat dict, percentiles included
+    """
+    summary = {"observations": stats.n, "min": stats.min_val, "mean": stats.mean,
+               "std_dev": stats.sd, "max": stats.max_val}
+    for p, value in stats.percentiles or ():
+        summary[percentile_label(p)] = value
+    return summary
+
+
+def format_hist(bins, hist, stats, height=20.0, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None):
+    """
+    Lay out a histogram from precomputed bins, bin counts and summary stats
+    """
+    if pch is None:
+        pch = "o"
+
+    ys, nlen = y_axis(min(hist), max(hist), height, regular)
+
+    # the whole chart is built up here and joined in one go
+    frame = []
+
+    if title:
+        frame.append(box_text([title], max(len(hist) * 2, len(title)), nlen) + "\n")
+    frame.append("\n")
+
+    if ytitle:
+        frame.append(" " + "y: " + ytitle + "\n\n")
+
+    for y, ylab in zip(ys, y_labels(ys, nlen)):
+        bar = "".join([pch if int(y) <= count else " " for count in hist])
+        frame.append(ylab + " " + colour_text(bar, colour) + "\n")
+    xs = range(len(hist))
+
+    frame.append(" " * (nlen + 1) + "-" * len(xs) + "\n")
 
     if xlab:
-        labels = abbreviate([str(b) for b in bins])
-        xlen = len(labels[0])
-        for i in range(0, xlen):
-            printcolour(" " * (nlen + 1), True, colour)
-            for x in range(0, len(hist)):
-                num = labels[x]
-                if x % 2 != 0:
-                    pass
-                elif i < len(num):
-                    print(num[i], end=' ')
-                else:
-                    print(" ", end=' ')
-            print('')
-    if xtitle: 
-        full_title = "x: "+ xtitle
-        print(" " * ((nlen + 1) + len(xs) - len(full_title)) + full_title  + "\n")
-        # return_string += " " * (xs - len(full_title)) + full_title  + "\n"
-
-    center = max(map(len, map(str, [n, min_val, mean, max_val])))
-    center += 15
+        for row in x_label_rows(bins):
+            frame.append(" " * (nlen + 1) + row + "\n")
+    if xtitle:
+        full_title = "x: " + xtitle
+        frame.append(" " * ((nlen + 1) + len(xs) - len(full_title)) + full_title + "\n\n")
 
     if showSummary:
-        print()
+        frame.append("\n")
         title = ["Summary"]
-        print(box_text(title, max(len(hist) * 2, len(title)), nlen))
-        stats = ["observations: %d" % n, "min value: %f" % min_val,
-        "mean : %f" % mean, "std dev : %f" % sd, "max value: %f" % max_val]
-        print(box_text(stats, max(len(hist) * 2, len(title)), nlen))
-        # print("-" * (2 + center))
-        # print("|" + "Summary".center(center) + "|")
-        # print("-" * (2 + center))
-        # summary = "|" + ("observations: %d" % n).center(center) + "|\n"
-        # summary += "|" + ("min value: %f" % min_val).center(center) + "|\n"
-        # summary += "|" + ("mean : %f" % mean).center(center) + "|\n"
-        # summary += "|" + ("std dev : %f" % sd).center(center) + "|\n"
-        # summary += "|" + ("max value: %f" % max_val).center(center) + "|\n"
-        # summary += "-" * (2 + center)
-        # print(summary)
-
-
-def main():
-
-    parser = optparse.OptionParser(usage=hist['usage'])
+        frame.append(box_text(title, max(len(hist) * 2, len(title)), nlen) + "\n")
+        frame.append(box_text(summary_lines(stats), max(len(hist) * 2, len(title)), nlen) + "\n")
+
+    return "".join(frame)
+
+
+def series_styles(count, pch="o", colour="default"):
+    """
+    A distinct (pch, colour) for each of count series
+
+    pch and colour may be lists with an entry per series. A single pch is
+    used for the first series, the others cycling through series_pchs;
+    colours cycle through series_colours, starting at colour if given.
+    """
+    def pick(value, palette):
+        if isinstance(value, (list, tuple)):
+            choices = list(value)
+        elif value is None or value == "default":
+            choices = list(palette)
+        else:
+            choices = [value] + [p for p in palette if p != value]
+        return [choices[i % len(choices)] for i in range(count)]
+
+    return list(zip(pick(pch or "o", series_pchs), pick(colour, series_colours)))
+
+
+def format_series_hist(bins, series, stats, height=20.0, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, layout="overlay"):
+    """
+    Lay out several histograms sharing bins, see series_histogram_counts
+
+    With layout="overlay" the series are drawn over each other, the
+    shorter bar in front wherever they overlap; with "multiples" they
+    are drawn side by side on a shared y-axis. A legend names the series
+    and the summary box has a row per series and one for all values.
+    """
+    if layout not in series_layouts:
+        raise ValueError("unknown layout %r (expected one of %s)" % (layout, ', '.join(series_layouts)))
+    styles = series_styles(len(series), pch, colour)
+    hists = [hist for _, hist, _ in series]
+    nbins = len(bins)
+    gap = "   "
+    if layout == "overlay":
+        width = nbins
+    else:
+        width = len(hists) * nbins + (len(hists) - 1) * len(gap)
+
+    ys, nlen = y_axis(min(min(hist) for hist in hists), max(max(hist) for hist in hists), height, regular)
+    indent = " " * (nlen + 1)
+    box_width = max(nbins * 2, width, len(title))
+
+    frame = []
+
+    if title:
+        frame.append(box_text([title], box_width, nlen) + "\n")
+    frame.append("\n")
+
+    if ytitle:
+        frame.append(" " + "y: " + ytitle + "\n\n")
+
+    for y, ylab in zip(ys, y_labels(ys, nlen)):
+        y = int(y)
+        if layout == "overlay":
+            cells = []
+            for i in range(nbins):
+                front = None
+                for k, counts in enumerate(hists):
+                    if y <= counts[i] and (front is None or counts[i] < hists[front][i]):
+                        front = k
+                cells.append((" ", "default") if front is None else styles[front])
+            bars = colour_runs(cells)
+        else:
+            bars = gap.join(colour_text("".join([p if y <= count else " " for count in counts]), c)
+                            for counts, (p, c) in zip(hists, styles))
+        frame.append(ylab + " " + bars + "\n")
+
+    blocks = 1 if layout == "overlay" else len(hists)
+    frame.append(indent + gap.join(["-" * nbins] * blocks) + "\n")
+
+    if xlab:
+        for row in x_label_rows(bins):
+            frame.append(indent + gap.join([row.ljust(nbins)[:nbins]] * blocks).rstrip() + "\n")
+    if xtitle:
+        full_title = "x: " + xtitle
+        frame.append(" " * ((nlen + 1) + width - len(full_title)) + full_title + "\n\n")
+
+    frame.append("\n")
+    for (name, _, _), (p, c) in zip(series, styles):
+        frame.append(indent + colour_text(p + " " + name, c) + "\n")
+
+    if showSummary:
+        rows = [("series", "observations", "min value", "mean", "std dev", "max value")]
+        for name, _, s in list(series) + [("all", None, stats)]:
+            if s.n:
+                rows.append((name, "%d" % s.n, "%f" % s.min_val, "%f" % s.mean, "%f" % s.sd, "%f" % s.max_val))
+            else:
+                rows.append((name, "0", "-", "-", "-", "-"))
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        lines = ["  ".join([row[0].ljust(widths[0])] + [v.rjust(w) for v, w in zip(row[1:], widths[1:])])
+                 for row in rows]
+        box_width = max(box_width, len(lines[0]) + 2)
+        frame.append("\n")
+        frame.append(box_text(["Summary"], box_width, nlen) + "\n")
+        frame.append(box_text(lines, box_width, nlen) + "\n")
+
+    return "".join(frame)
+
+
+def iter_lines(stream, timeout=1.0, tail=False):
+    """
+    Yield lists of lines from a stream as they arrive
+
+    An empty list is yielded whenever timeout seconds pass without input,
+    so the caller gets a chance to redraw while a tailed stream is idle.
+    With tail, reaching the end of the stream is not the end: like tail
+    -f it is polled every timeout seconds for more, e.g. a growing file.
+    """
+    try:
+        fd = stream.fileno()
+    except (AttributeError, ValueError, io.UnsupportedOperation):
+        fd = None
+
+    if fd is None or os.name != 'posix':
+        while True:
+            line = stream.readline()
+            if line:
+                yield [line]
+            elif not tail:
+                return
+            else:
+                time.sleep(timeout)
+                yield []
+
+    import select
+
+    pending = b''
+    while True:
+        ready, _, _ = select.select([fd], [], [], timeout)
+        if not ready:
+            yield []
+            continue
+        data = os.read(fd, 1 << 16)
+        if not data:
+            if not tail:
+                break
+            time.sleep(timeout)
+            yield []
+            continue
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        yield lines
+    if pending:
+        yield [pending]
+
+
+def follow_hist(stream, height=20.0, bincount=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, refresh=1.0, out=None, tail=False):
+    """
+    Make a histogram of a stream, redrawing it in place as values arrive
+
+    Bin counts are updated incrementally; values outside the current
+    range widen the bins instead of triggering a recount. Lines that are
+    not finite numbers (including nan and inf) are skipped. The stream is
+    followed until it ends, or with tail (for a file being appended to)
+    until interrupted.
+
+    Arguments:
+        stream -- file object to follow, e.g. sys.stdin
+        refresh -- minimum number of seconds between redraws
+        out -- file-like object to draw on, defaults to sys.stdout
+        tail -- keep polling for more input at the end of the stream
+        (the rest as in plot_hist)
+    """
+    if out is None:
+        out = sys.stdout
+
+    hist = AdaptiveHistogram(bincount or 20)
+    stats = RunningStats()
+    drawn, last_draw, dirty = 0, time.time(), False
+
+    def redraw():
+        text = format_hist(hist.bins(), hist.counts, stats, height, pch, colour, title,
+                           xlab, showSummary, regular, xtitle, ytitle)
+        if drawn:
+            # jump back to the top of the previous frame and clear it
+            text = "\033[%dF\033[J" % drawn + text
+        out.write(text)
+        out.flush()
+        return text.count("\n")
+
+    try:
+        for lines in iter_lines(stream, refresh, tail):
+            for line in lines:
+                try:
+                    number = float(line)
+                except ValueError:
+                    continue
+                if not math.isfinite(number):
+                    continue
+                hist.add(number)
+                stats.push(number)
+                dirty = True
+            if dirty and time.time() - last_draw >= refresh:
+                drawn, last_draw, dirty = redraw(), time.time(), False
+    except KeyboardInterrupt:
+        # the way out of tailing a file
+        pass
+
+    if dirty:
+        redraw()
+
+
+def parse_args(argv=None, out=None, err=None, cwd=None):
+    """
+    Parse the hist command line into (opts, files), expanding file globs
+    """
+    parser = CommandParser(usage=hist['usage'], prog='hist', out=out, err=err, cwd=cwd)
 
     parser.add_option(
-        '-f', '--file', help='a file containing a column of numbers', default=None, dest='f')
+        '-f', '--file', help='a file containing a column of numbers (repeatable, globs allowed)',
+        default=[], action='append', type='path', dest='f')
     parser.add_option('-t', '--title', help='title for the chart', default="", dest='t')
     parser.add_option(
         '-b', '--bins', help='number of bins in the histogram', type='int', default=None, dest='b')
@@ -252,22 +1000,159 @@ def main():
     parser.add_option('-r', '--regular',
                       help='use regular y-scale (0 - maximum y value), instead of truncated y-scale (minimum y-value - maximum y-value)',
                       default=False, action="store_true", dest='regular')
+    parser.add_option('--backend', help='parsing and binning backend (%s)' % backend_help,
+                      type='choice', choices=list(backends), default='python', dest='backend')
+    parser.add_option('-j', '--jobs', help='worker processes for reading files (0 for one per core)',
+                      type='int', default=None, dest='jobs')
+    parser.add_option('--sketch', help='approximate the counts with a fixed-memory sketch',
+                      default=False, action='store_true', dest='sketch')
+    parser.add_option('--load-sketch', help='merge a saved sketch into the plot (repeatable)',
+                      default=[], action='append', type='path', dest='load_sketch')
+    parser.add_option('--save-sketch', help='save the sketch of the input to a file instead of plotting',
+                      default=None, type='path', dest='save_sketch')
+    parser.add_option('--follow', help='keep reading the input (and a file as it grows) and redraw as values arrive',
+                      default=False, action='store_true', dest='follow')
+    parser.add_option('--refresh', help='seconds between redraws in follow mode',
+                      type='float', default=1.0, dest='refresh')
+    parser.add_option('--input-format', help='format of the input (%s)' % input_format_help,
+                      type='choice', choices=list(input_formats), default='text', dest='input_format')
+    parser.add_option('--cache-dir', help='reuse results for unchanged files, kept in this directory',
+                      default=None, type='path', dest='cache_dir')
+    parser.add_option('--series', help='plot every file as a series of its own, on shared bins',
+                      default=False, action='store_true', dest='series')
+    parser.add_option('--group', help='csv column (index or header name) naming the series of each value',
+                      default=None, dest='group')
+    parser.add_option('--value-col', help='csv column of the values with --group (default the other column)',
+                      default=None, dest='value_col')
+    parser.add_option('--layout', help='how to draw several series (%s)' % ', '.join(series_layouts),
+                      type='choice', choices=list(series_layouts), default='overlay', dest='layout')
+    parser.add_option('--sample', help='bin a random sample of this many values (summary stays exact)',
+                      type='int', default=None, dest='sample')
+    parser.add_option('--seed', help='random seed for --sample', type='int', default=None, dest='seed')
+    parser.add_option('--percentiles', help='comma separated percentiles to add to the summary, e.g. 50,90,99,99.9',
+                      default=None, dest='percentiles')
+    parser.add_option('--format', help='write the bins and summary instead of a chart (%s)' % output_format_help,
+                      type='choice', choices=list(output_formats), default='text', dest='output_format')
+    parser.add_option('--accuracy', help='find the percentiles in bounded memory, to this relative accuracy (e.g. 0.01)',
+                      type='float', default=None, dest='accuracy')
 
-    opts, args = parser.parse_args()
+    opts, args = parser.parse_args(argv)
+    files = expand_files(opts.f + args)
+    if opts.input_format != "text" and (len(files) > 1 or opts.jobs is not None):
+        parser.error("several files or --jobs need --input-format text")
+    if (opts.series or opts.group is not None) and (opts.sketch or opts.jobs is not None or opts.input_format != "text"):
+        parser.error("--series and --group read text input, without --sketch or --jobs")
+    if opts.sample is not None and opts.sample < 1:
+        parser.error("--sample needs a positive number of values")
+    if opts.sample and (opts.sketch or opts.load_sketch or opts.save_sketch or opts.series
+                        or opts.group is not None or opts.input_format == "weighted"):
+        parser.error("--sample can't be used with sketches, series or weighted input")
+    if opts.sample and (len(files) > 1 or opts.jobs is not None):
+        parser.error("--sample reads a single input, without --jobs")
+    if opts.backend == "numpy" and (len(files) > 1 or opts.jobs is not None or opts.series or opts.group is not None
+                                    or opts.sketch or opts.load_sketch or opts.save_sketch or opts.sample
+                                    or opts.input_format == "weighted"):
+        parser.error("--backend numpy reads a single input, without --jobs, series, sketches, --sample or weighted input")
+    if opts.series and not files:
+        parser.error("--series needs input files")
+    if opts.series and opts.group is not None:
+        parser.error("use either --series or --group")
+    if opts.percentiles is not None:
+        try:
+            opts.percentiles = parse_percentiles(opts.percentiles)
+        except ValueError as e:
+            parser.error("--percentiles: %s" % e)
+        if opts.series or opts.group is not None or len(files) > 1 or opts.jobs is not None:
+            parser.error("--percentiles reads a single input, without series or --jobs")
+    if opts.follow:
+        ignored = [name for name, given in [
+            ("several files", len(files) > 1), ("--binwidth", opts.binwidth is not None),
+            ("--backend %s" % opts.backend, opts.backend != "python"), ("--jobs", opts.jobs is not None),
+            ("sketches", opts.sketch or opts.load_sketch or opts.save_sketch),
+            ("--input-format %s" % opts.input_format, opts.input_format != "text"),
+            ("--cache-dir", opts.cache_dir), ("--series", opts.series), ("--group", opts.group is not None),
+            ("--sample", opts.sample), ("--percentiles", opts.percentiles), ("--accuracy", opts.accuracy is not None)]
+            if given]
+        if ignored:
+            parser.error("--follow draws a single text input, without %s" % ", ".join(ignored))
+    if opts.accuracy is not None and not 0 < opts.accuracy < 1:
+        parser.error("--accuracy must be between 0 and 1")
+    if opts.output_format != "text" and (opts.series or opts.group is not None or opts.follow or opts.demo):
+        parser.error("--format %s writes a single histogram, without series, --follow or --demo" % opts.output_format)
+    return opts, files
 
-    if opts.f is None:
-        if len(args) > 0:
-            opts.f = args[0]
-        elif opts.demo is None or opts.demo is False:
-            opts.f = sys.stdin.readlines()
 
-    if opts.demo:
-        run_demo()
-    elif opts.f:
-        plot_hist(opts.f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
-                  opts.t, opts.x, opts.showSummary, opts.regular)
+def run(argv=None, stdin=None, out=None, err=None, cwd=None):
+    """
+    Run the hist command, reading stdin and writing to out when given
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    out = sys.stdout if out is None else out
+    opts, files = parse_args(argv, out, err, cwd)
+
+    if len(files) > 1 and opts.jobs is None:
+        opts.jobs = 0
+    if not files:
+        opts.jobs = None
+        opts.f = None if opts.demo or opts.load_sketch else stdin
+    elif opts.jobs is not None:
+        opts.f = files
     else:
-        print("nothing to plot!")
+        opts.f = files[0]
+
+    try:
+        if opts.demo:
+            run_demo(out)
+        elif opts.follow and opts.f:
+            if files:
+                with open(files[0], 'rb') as stream:
+                    follow_hist(stream, opts.h, opts.b, opts.p, opts.colour, opts.t, opts.x,
+                                opts.showSummary, opts.regular, refresh=opts.refresh, out=out, tail=True)
+            else:
+                follow_hist(opts.f, opts.h, opts.b, opts.p, opts.colour, opts.t, opts.x,
+                            opts.showSummary, opts.regular, refresh=opts.refresh, out=out)
+        elif opts.series or opts.group is not None:
+            if opts.series:
+                f, groupcol, valuecol = dict((path, path) for path in files), None, None
+            else:
+                f = files[0] if files else stdin
+                groupcol = column_key(opts.group)
+                valuecol = None if opts.value_col is None else column_key(opts.value_col)
+            render_hist(f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour, opts.t, opts.x,
+                        opts.showSummary, opts.regular, cache=opts.cache_dir, groupcol=groupcol,
+                        valuecol=valuecol, layout=opts.layout, out=out)
+        elif opts.sketch or opts.load_sketch or opts.save_sketch:
+            sketch = load_sketches(opts.load_sketch) or DDSketch(opts.accuracy or 0.01)
+            for f in files or ([opts.f] if opts.f else []):
+                sketch_input(sketch, f, opts.input_format)
+            if opts.save_sketch:
+                with open(opts.save_sketch, 'w') as fh:
+                    fh.write(sketch.dumps())
+            elif opts.output_format != "text":
+                out.write(format_hist_data(hist_data(None, opts.b, opts.binwidth, sketch=sketch,
+                                                     percentiles=opts.percentiles), opts.output_format))
+            else:
+                render_hist(None, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
+                            opts.t, opts.x, opts.showSummary, opts.regular, sketch=sketch,
+                            percentiles=opts.percentiles, out=out)
+        elif opts.f and opts.output_format != "text":
+            data = hist_data(opts.f, opts.b, opts.binwidth, opts.backend, jobs=opts.jobs, input_format=opts.input_format,
+                             cache=opts.cache_dir, sample=opts.sample, seed=opts.seed, percentiles=opts.percentiles,
+                             accuracy=opts.accuracy)
+            out.write(format_hist_data(data, opts.output_format))
+        elif opts.f:
+            render_hist(opts.f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
+                        opts.t, opts.x, opts.showSummary, opts.regular, backend=opts.backend, jobs=opts.jobs,
+                        input_format=opts.input_format, cache=opts.cache_dir, sample=opts.sample,
+                        seed=opts.seed, percentiles=opts.percentiles, accuracy=opts.accuracy, out=out)
+        else:
+            out.write("nothing to plot!\n")
+    except NoDataError:
+        out.write("nothing to plot!\n")
+
+
+def main(argv=None):
+    return run(argv)
 
 
 if __name__ == "__main__":
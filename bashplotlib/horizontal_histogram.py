@@ -11,46 +11,21 @@ from __future__ import division
 import os
 import sys
 import math
-import optparse
+from bisect import bisect_right
+from itertools import accumulate, zip_longest
 from os.path import dirname
 from .utils.helpers import *
-from .utils.commandhelp import hist
+from .utils.commandhelp import CommandParser, hist
+from .histogram import histogram_counts, cached_histogram_counts, summary_lines, y_axis
+from .utils.cache import get_cache
+from .utils.backend import backend_help, backends
 
 
-def calc_bins(n, min_val, max_val, h=None, binwidth=None):
-    """
-    Calculate number of bins for the histogram
-    """
-    if not h:
-        h = max(10, math.log(n + 1, 2))
-    if binwidth == 0:
-        binwidth = 0.1
-    if binwidth is None:
-        binwidth = (max_val - min_val) / h
-    for b in drange(min_val, max_val, step=binwidth, include_stop=True):
-        if b.is_integer():
-            yield int(b)
-        else:
-            yield b
-
-
-def read_numbers(numbers):
-    """
-    Read the input data in the most optimal way
-    """
-    if isiterable(numbers):
-        for number in numbers:
-            yield float(str(number).strip())
-    else:
-        with open(numbers) as fh:
-            for number in fh:
-                yield float(number.strip())
-
-
-def run_demo():
+def run_demo(out=None):
     """
     Run a demonstration
     """
+    out = sys.stdout if out is None else out
     module_dir = dirname(dirname(os.path.realpath(__file__)))
     demo_file = os.path.join(module_dir, 'examples/data/exp.txt')
 
@@ -60,35 +35,35 @@ def run_demo():
         sys.exit(1)
 
     # plotting a histogram
-    print("plotting a basic histogram")
-    print("plot_horiz_hist('%s')" % demo_file)
-    print("hist -f %s" % demo_file)
-    print("cat %s | hist" % demo_file)
-    plot_horiz_hist(demo_file)
-    print("*" * 80)
+    print("plotting a basic histogram", file=out)
+    print("plot_horiz_hist('%s')" % demo_file, file=out)
+    print("hist -f %s" % demo_file, file=out)
+    print("cat %s | hist" % demo_file, file=out)
+    render_horiz_hist(demo_file, out=out)
+    print("*" * 80, file=out)
 
     # with colours
-    print("histogram with colours")
-    print("plot_horiz_hist('%s', colour='blue')" % demo_file)
-    print("hist -f %s -c blue" % demo_file)
-    plot_horiz_hist(demo_file, colour='blue')
-    print("*" * 80)
+    print("histogram with colours", file=out)
+    print("plot_horiz_hist('%s', colour='blue')" % demo_file, file=out)
+    print("hist -f %s -c blue" % demo_file, file=out)
+    render_horiz_hist(demo_file, colour='blue', out=out)
+    print("*" * 80, file=out)
 
     # changing the shape of the point
-    print("changing the shape of the bars")
-    print("plot_horiz_hist('%s', pch='.')" % demo_file)
-    print("hist -f %s -p ." % demo_file)
-    plot_horiz_hist(demo_file, pch='.')
-    print("*" * 80)
+    print("changing the shape of the bars", file=out)
+    print("plot_horiz_hist('%s', pch='.')" % demo_file, file=out)
+    print("hist -f %s -p ." % demo_file, file=out)
+    render_horiz_hist(demo_file, pch='.', out=out)
+    print("*" * 80, file=out)
 
     # changing the size of the plot
-    print("changing the size of the plot")
-    print("plot_horiz_hist('%s', width=35.0, bincount=40)" % demo_file)
-    print("hist -f %s -s 35.0 -b 40" % demo_file)
-    plot_horiz_hist(demo_file, width=35.0, bincount=40)
+    print("changing the size of the plot", file=out)
+    print("plot_horiz_hist('%s', width=35.0, bincount=40)" % demo_file, file=out)
+    print("hist -f %s -s 35.0 -b 40" % demo_file, file=out)
+    render_horiz_hist(demo_file, width=35.0, bincount=40, out=out)
 
 
-def plot_horiz_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None):
+def plot_horiz_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, backend="python", cache=None):
     """
     Make a histogram
 
@@ -102,171 +77,148 @@ def plot_horiz_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour
         xlab -- boolen value for whether or not to display x-axis labels
         showSummary -- boolean value for whether or not to display a summary
         regular -- boolean value for whether or not to start y-labels at 0
+        backend -- "python", "numpy" or "auto" (numpy falls back to python if missing)
+        cache -- True, a directory or a RenderCache to reuse results for unchanged files
     """
-    if pch is None:
-        pch = "o"
-
-    if isinstance(f, str):
-        with open(f) as fh:
-            f = fh.readlines()
+    sys.stdout.write(render_horiz_hist(f, width, bincount, binwidth, pch, colour, title, xlab,
+                                       showSummary, regular, xtitle, ytitle, backend, cache))
 
-    min_val, max_val = None, None
-    n, mean, sd = 0.0, 0.0, 0.0
 
-    for number in read_numbers(f):
-        n += 1
-        if min_val is None or number < min_val:
-            min_val = number
-        if max_val is None or number > max_val:
-            max_val = number
-        mean += number
+def render_horiz_hist(f, width=20.0, bincount=None, binwidth=None, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None, backend="python", cache=None, out=None):
+    """
+    Make a histogram and return it as a string instead of printing it
 
-    mean /= n
+    Takes the same arguments as plot_horiz_hist, plus:
+        out -- optional file-like object the chart is also written to
+    """
+    cache = get_cache(cache)
+    if cache is None:
+        bins, hist, stats = histogram_counts(f, bincount, binwidth, backend)
+        text = format_horiz_hist(bins, hist, stats, width, pch, colour, title, xlab,
+                                 showSummary, regular, xtitle, ytitle)
+    else:
+        def draw():
+            bins, hist, stats = cached_histogram_counts(cache, f, bincount, binwidth, backend)
+            return format_horiz_hist(bins, hist, stats, width, pch, colour, title, xlab,
+                                     showSummary, regular, xtitle, ytitle)
+        key = cache.key("hbar", f, (width, bincount, binwidth, pch, colour, title, xlab,
+                                    showSummary, regular, xtitle, ytitle, backend))
+        text = cache.lookup(key, draw)
+    if out is not None:
+        out.write(text)
+    return text
+
+
+def format_horiz_hist(bins, hist, stats, width=20.0, pch="o", colour="default", title="", xlab=None, showSummary=False, regular=False, xtitle=None, ytitle=None):
+    """
+    Lay out a horizontal histogram from precomputed bins, counts and stats
+    """
+    if pch is None:
+        pch = "o"
 
-    for number in read_numbers(f):
-        sd += (mean - number)**2
+    ys, nlen = y_axis(min(hist), max(hist), width, regular)
 
-    sd /= (n - 1)
-    sd **= 0.5
+    max_bin, min_bin = 0, len(hist) - 1
+    binlen = max(len(str(min_bin)), len(str(max_bin)))
 
-    bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
-    hist = dict((i, 0) for i in range(len(bins)))
+    frame = []
 
-    for number in read_numbers(f):
-        for i, b in enumerate(bins):
-            if number <= b:
-                hist[i] += 1
-                break
-        if number == max_val and max_val > bins[len(bins) - 1]:
-            hist[len(hist) - 1] += 1
+    if title:
+        frame.append(box_text([title], max(len(hist) * 2, len(title)), nlen) + "\n")
+    frame.append("\n")
 
-    min_y, max_y = min(hist.values()), max(hist.values())
+    if xtitle:
+        frame.append(" " + "x: " + xtitle + "\n")
 
-    start = max(min_y, 1)
-    stop = max_y + 1
+    xs = bucket_edges(stats.min_val, stats.max_val)
 
-    if regular:
-        start = 1
+    if xlab:
+        # bar lengths are found by bisecting the ascending row values
+        levels = ys[::-1]
+        for x, bin_sum in zip(xs, bucket_sums(hist, xs)):
+            binlab = str(int(x))
+            binlab = " " * (binlen - len(binlab)) + binlab + "|"
+            bar = pch * bisect_right(levels, bin_sum)
+            frame.append(binlab + " " + colour_text(bar, colour) + "\n")
 
-    if width is None:
-        width = stop - start
-        if width > 20:
-            width = 20
+    frame.append(" " * (nlen + 1) + "-" * len(ys) + "\n")
 
-    ys = list(drange(start, stop, float(stop - start) / width))
     ys.reverse()
+    frame.append(get_y_label(ys, binlen) + "\n")
 
-    nlen = max(len(str(min_y)), len(str(max_y))) + 1
-
-    max_bin, min_bin = min(hist.keys()), max(hist.keys())
-    binlen = max(len(str(min_bin)), len(str(max_bin)))
+    if ytitle:
+        full_title = "y: " + ytitle
+        frame.append(" " * ((nlen + 1) + len(xs) - len(full_title)) + full_title + "\n")
 
-    if title:
-        print(box_text([title], max(len(hist) * 2, len(title)), nlen))
-    print()
+    if showSummary:
+        frame.append("\n")
+        title = ["Summary"]
+        frame.append(box_text(title, max(len(hist) * 2, len(title)), nlen) + "\n")
+        frame.append(box_text(summary_lines(stats), max(len(hist) * 2, len(title)), nlen) + "\n")
 
-    if xtitle: 
-        print(" " + "x: "+ xtitle   )
-        # return_string += "y: "+ ytitle  + "\n"
+    return "".join(frame)
 
 
-    start = min_val
+def bucket_edges(min_val, max_val, num_buckets=11):
+    """
+    Upper edges of the rows of a horizontal histogram, the last one at max_val + 1
+    """
     stop = max_val + 1
-    num_buckets = 11
-    xs = list(drange(start, stop, float(stop - start) / num_buckets))
+    return list(drange(min_val, stop, float(stop - min_val) / num_buckets, include_stop=True))
 
-    if xlab:
-        index = 0
-        for x in xs:
-            binlab = str(int(x))
-            binlab = " " * (binlen - len(binlab)) + binlab + "|"
-            print(binlab, end=' ')
-
-            bin_sum = 0
-            for i in hist.keys():
-                if i >= index and i <= x:
-                    bin_sum += hist[i]
-                    index = i + 1
-            
-            for y in ys:
-                if bin_sum >= y:
-                    printcolour(pch, True, colour)
-            print('')
-    
-    print(" " * (nlen + 1) + "-" * len(ys))
 
-    ys.reverse()
-    print(get_y_label(ys, binlen))
-
-
-    if ytitle: 
-        full_title = "y: "+ ytitle
-        print(" " * ((nlen + 1) + len(xs) - len(full_title)) + full_title)
-        # return_string += " " * (xs - len(full_title)) + full_title  + "\n"
+def bucket_sums(hist, xs):
+    """
+    Total the bin counts into the buckets ending at each of xs
 
-    center = max(map(len, map(str, [n, min_val, mean, max_val])))
-    center += 15
+    Bucket k takes the bins whose index is above the previous bucket and
+    at most xs[k], read off a running total of the counts in one pass. The
+    last bucket also takes any bins past it, so every count is shown.
+    """
+    totals = [0]
+    totals.extend(accumulate(hist))
+    last = len(hist) - 1
+    sums = []
+    index = 0
+    for x in xs:
+        upper = min(int(math.floor(x)), last)
+        if upper < index:
+            sums.append(0)
+            continue
+        sums.append(totals[upper + 1] - totals[index])
+        index = upper + 1
+    if sums:
+        sums[-1] += totals[-1] - totals[index]
+    return sums
 
-    if showSummary:
-        print()
-        title = ["Summary"]
-        print(box_text(title, max(len(hist) * 2, len(title)), nlen))
-        stats = ["observations: %d" % n, "min value: %f" % min_val,
-        "mean : %f" % mean, "std dev : %f" % sd, "max value: %f" % max_val]
-        print(box_text(stats, max(len(hist) * 2, len(title)), nlen))
 
 def get_y_label(ys, binlen):
-    y_master_label = ""
-    ys_copy = ys[:]
+    """
+    Label the columns of a horizontal histogram with vertical digits
 
+    Every value is written top down below its column, each one only the
+    first time it occurs.
+    """
+    labels = []
     used_labels = set()
-    for (i, y) in enumerate(ys_copy):
-        y = int(y)
-        if y in used_labels:
-            ys_copy[i] = 0
-        else: 
-            ys_copy[i] = int(y)
-            used_labels.add(y)
-
-    zeros = len(ys)*[0]
-    continue_build = True
-
-    
-
-    while continue_build:
-        y_master_label += " " * (binlen + 2)
-        power_of_ten = 10
-
-        for (i, y) in enumerate(ys_copy):
-            if y < 1:
-                if zeros[i] > 0:
-                    y_master_label += "0"   
-                else:
-                    y_master_label += " "
-            else:
-                while y >= power_of_ten:
-                    power_of_ten *= 10
-                    zeros[i] += 1
-                add_val = y // (power_of_ten/10)
-                y_master_label += str(int(add_val))
-                # print(ys_copy)
-                ys_copy[i] -= add_val * (power_of_ten/10)
-                zeros[i] -= 1
-        
-        continue_build = False
-        for y in ys_copy:
-            if y > 0:
-                continue_build = True
-                y_master_label += "\n"
-                break
-    return y_master_label
-
-def main():
-
-    parser = optparse.OptionParser(usage=hist['usage'])
+    for y in ys:
+        label = str(int(y))
+        if label in used_labels:
+            label = ""
+        used_labels.add(label)
+        labels.append(label)
+    indent = " " * (binlen + 2)
+    return "\n".join(indent + "".join(row) for row in zip_longest(*labels, fillvalue=" "))
+
+
+def parse_args(argv=None, out=None, err=None, cwd=None):
+    """
+    Parse the hbar command line into (opts, args)
+    """
+    parser = CommandParser(usage=hist['usage'], prog='hbar', out=out, err=err, cwd=cwd)
 
     parser.add_option(
-        '-f', '--file', help='a file containing a column of numbers', default=None, dest='f')
+        '-f', '--file', help='a file containing a column of numbers', default=None, type='path', dest='f')
     parser.add_option('-t', '--title', help='title for the chart', default="", dest='t')
     parser.add_option(
         '-b', '--bins', help='number of bins in the histogram', type='int', default=None, dest='b')
@@ -285,22 +237,43 @@ def main():
     parser.add_option('-r', '--regular',
                       help='use regular y-scale (0 - maximum y value), instead of truncated y-scale (minimum y-value - maximum y-value)',
                       default=False, action="store_true", dest='regular')
+    parser.add_option('--backend', help='parsing and binning backend (%s)' % backend_help,
+                      type='choice', choices=list(backends), default='python', dest='backend')
+    parser.add_option('--cache-dir', help='reuse results for unchanged files, kept in this directory',
+                      default=None, type='path', dest='cache_dir')
 
-    opts, args = parser.parse_args()
+    return parser.parse_args(argv)
+
+
+def run(argv=None, stdin=None, out=None, err=None, cwd=None):
+    """
+    Run the hbar command, reading stdin and writing to out when given
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    out = sys.stdout if out is None else out
+    opts, args = parse_args(argv, out, err, cwd)
 
     if opts.f is None:
         if len(args) > 0:
             opts.f = args[0]
         elif opts.demo is None or opts.demo is False:
-            opts.f = sys.stdin.readlines()
+            opts.f = stdin
 
     if opts.demo:
-        run_demo()
+        run_demo(out)
     elif opts.f:
-        plot_hist(opts.f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
-                  opts.t, opts.x, opts.showSummary, opts.regular)
+        try:
+            render_horiz_hist(opts.f, opts.h, opts.b, opts.binwidth, opts.p, opts.colour,
+                              opts.t, opts.x, opts.showSummary, opts.regular, backend=opts.backend,
+                              cache=opts.cache_dir, out=out)
+        except NoDataError:
+            out.write("nothing to plot!\n")
     else:
-        print("nothing to plot!")
+        out.write("nothing to plot!\n")
+
+
+def main(argv=None):
+    return run(argv)
 
 
 if __name__ == "__main__":
@@ -8,14 +8,24 @@ Plotting terminal based scatterplots
 from __future__ import print_function
 import csv
 import sys
-import optparse
+from array import array
+from bisect import bisect_left, bisect_right
 from .utils.helpers import *
-from .utils.commandhelp import scatter
+from .utils.commandhelp import CommandParser, scatter
+from .utils import backend as numpy_backend
+from .utils.backend import backend_help, backends, resolve_backend
+from .utils.cache import get_cache
+from .utils.export import dumps, output_format_help, output_formats
+from .utils.sampling import Reservoir
+from .utils.readers import (ROW_BLOCK, column_key, first_row, group_columns, iter_column_chunks, iter_number_chunks,
+                            zip_chunks)
 
 
-def get_scale(series, is_y=False, steps=20):
-    min_val = min(series)
-    max_val = max(series)
+def get_scale(series, is_y=False, steps=20, min_val=None, max_val=None):
+    if min_val is None:
+        min_val = min(series)
+    if max_val is None:
+        max_val = max(series)
     scaled_series = []
     for x in drange(min_val, max_val, (max_val - min_val) / steps,
                     include_stop=True):
@@ -28,119 +38,522 @@ def get_scale(series, is_y=False, steps=20):
     return scaled_series
 
 
-def build_scatter(xs, ys, size, pch, colour, title, cs, xtitle, ytitle):
-    x_scale = get_scale(xs, False, size)
-    y_scale = get_scale(ys, True, size)
+def base_grid(x_scale, y_scale):
+    """
+    Empty plot area with the axes drawn in where the scales cross zero
+    """
+    grid = []
+    for y in y_scale:
+        if y == 0.0:
+            grid.append(["o" if x == 0.0 else "-" for x in x_scale])
+        else:
+            grid.append(["|" if x == 0.0 else " " for x in x_scale])
+    return grid
 
-    plotted = set()
-    return_string = ""
 
+def format_grid(grid, colours, x_scale, y_scale, title, xtitle, ytitle):
+    """
+    Frame a grid of cells (and their colours) with border and titles
+    """
+    n_cols = len(x_scale)
+    lines = []
     if title:
-        return_string += box_text([title], 2 * (len(x_scale) + 1)) + "\n"
+        lines.append(box_text([title], 2 * (n_cols + 1)) + "\n")
+
+    if ytitle:
+        lines.append("y: " + ytitle + "\n")
+    border = "+" + "-" * (2 * (n_cols + 1)) + "+" + "\n"
+    lines.append(border)
 
-    if ytitle: 
-        return_string += "y: "+ ytitle  + "\n"
-    return_string += "+" + "-" * (2 * (len(x_scale) + 1)) + "+"  + "\n"
-    
     for (i, y) in enumerate(y_scale):
-        return_string += "| "
-        addHoriz = False
-        if y == 0.0:
-            addHoriz = True
-        for (j, x) in enumerate(x_scale):
-            addVert = x == 0.0
-            if addHoriz and addVert:
-                point = "o"
-            elif addHoriz:
-                point = "-"
-            elif addVert:
-                point = "|"
-            else:
-                point = " "
-            for (k, (xp, yp)) in enumerate(zip(xs, ys)):
-                if xp <= x and yp >= y and (xp, yp) not in plotted:
-                    point = pch
-                    plotted.add((xp, yp))
-                    if cs:
-                        colour = cs[k]
-            # return_string += getPointInColour(point + " ", True, colour)
-            return_string += point + " "
-            
-        if addHoriz:
-            return_string += "-|"  + "\n"
-        else:
-            return_string += " |"  + "\n"
-        
+        cells = []
+        for (point, point_colour) in zip(grid[i], colours[i]):
+            cells.append((point, point_colour))
+            cells.append((" ", None))
+        lines.append("| " + colour_runs(cells) + ("-|" if y == 0.0 else " |") + "\n")
 
+    lines.append(border)
+    if xtitle:
+        lines.append(" " * (2 * (n_cols + 2) - len("x: " + xtitle)) + "x: " + xtitle + "\n")
+    return "".join(lines)
 
-    return_string += "+" + "-" * (2 * (len(x_scale) + 1)) + "+"  + "\n"
-    if xtitle: 
-        return_string += " " * (2 * (len(x_scale) + 2) - len("x: "+ xtitle)) + "x: "+ xtitle  + "\n"
-    return return_string
 
-def plot_scatter(f, xs, ys, size, pch, colour, title, xtitle=None, ytitle=None):
+def build_scatter(xs, ys, size, pch, colour, title, cs, xtitle, ytitle, bounds=None):
     """
-    Form a complex number.
+    Render a scatterplot as a string
+
+    Each point is mapped straight to its grid cell (the first row whose y
+    is <= the point's y, the first column whose x is >= the point's x), so
+    drawing is O(points + cells) rather than O(points * cells). bounds is
+    an optional precomputed (x_min, x_max, y_min, y_max).
+    """
+    if bounds is None and (xs is None or ys is None or len(xs) == 0 or len(ys) == 0):
+        raise NoDataError("no points to plot")
+    x_min, x_max, y_min, y_max = bounds or (None, None, None, None)
+    x_scale = get_scale(xs, False, size, x_min, x_max)
+    y_scale = get_scale(ys, True, size, y_min, y_max)
+    y_ascending = y_scale[::-1]
+    n_cols, n_rows = len(x_scale), len(y_scale)
+
+    grid = base_grid(x_scale, y_scale)
+    colours = [[None] * n_cols for _ in y_scale]
+
+    for (k, (xp, yp)) in enumerate(zip(xs, ys)):
+        j = bisect_left(x_scale, xp)
+        i = n_rows - bisect_right(y_ascending, yp)
+        if j == n_cols or i == n_rows:
+            continue
+        grid[i][j] = pch
+        colours[i][j] = cs[k] if cs else colour
+
+    return format_grid(grid, colours, x_scale, y_scale, title, xtitle, ytitle)
+
+
+def build_density(chunks, size, colour, title, xtitle, ytitle, ramp=density_ramp, bounds=None):
+    """
+    Render a density plot of many points as a string
+
+    The points are counted per cell by grid_counts, and cells are drawn
+    with the ramp character for their count.
+    """
+    x_scale, y_scale, counts, bounds = grid_counts(chunks, size, bounds)
+    n_cols = len(x_scale)
+
+    max_count = max(max(row) for row in counts)
+    grid = base_grid(x_scale, y_scale)
+    colours = [[None] * n_cols for _ in y_scale]
+    for (i, row) in enumerate(counts):
+        for (j, count) in enumerate(row):
+            if count:
+                grid[i][j] = density_char(count, max_count, ramp)
+                colours[i][j] = colour
+
+    return format_grid(grid, colours, x_scale, y_scale, title, xtitle, ytitle)
+
+
+def grid_counts(chunks, size, bounds=None):
+    """
+    Count the points in each cell of the plot grid
+
+    chunks is a function returning (xs, ys) chunks, see xy_chunks. The
+    input is read twice, once for the bounds and once to count points
+    per cell, so memory stays at one counter per cell however many
+    points there are: paths are simply read again, one-shot streams
+    replayed from a spool file. Known (x_min, x_max, y_min, y_max) bounds save the
+    first pass. Points go in the same cells as build_scatter puts them.
+
+    Returns (x_scale, y_scale, counts, bounds) where counts[i][j] is the
+    cell at y_scale[i] (top row first) and x_scale[j].
+    """
+    if bounds is None:
+        for x_chunk, y_chunk in chunks():
+            bounds = update_bounds(bounds, x_chunk, y_chunk)
+    if bounds is None:
+        raise NoDataError("no points to plot")
+    x_min, x_max, y_min, y_max = bounds
+
+    x_scale = get_scale(None, False, size, x_min, x_max)
+    y_scale = get_scale(None, True, size, y_min, y_max)
+    y_ascending = y_scale[::-1]
+    n_cols, n_rows = len(x_scale), len(y_scale)
+
+    counts = [[0] * n_cols for _ in y_scale]
+    for x_chunk, y_chunk in chunks():
+        for xp, yp in zip(x_chunk, y_chunk):
+            j = bisect_left(x_scale, xp)
+            i = n_rows - bisect_right(y_ascending, yp)
+            if j == n_cols or i == n_rows:
+                continue
+            counts[i][j] += 1
+    return x_scale, y_scale, counts, bounds
+
+
+def read_column(path):
+    """
+    Read a file with one number per line into an array, chunk by chunk
+    """
+    values = array('d')
+    for chunk in iter_number_chunks(path):
+        values.extend(chunk)
+    return values
+
+
+def update_bounds(bounds, xs, ys):
+    """
+    Widen (x_min, x_max, y_min, y_max) to take in a chunk of points
+    """
+    if not len(xs):
+        return bounds
+    chunk = (min(xs), max(xs), min(ys), max(ys))
+    if bounds is None:
+        return chunk
+    return (min(bounds[0], chunk[0]), max(bounds[1], chunk[1]),
+            min(bounds[2], chunk[2]), max(bounds[3], chunk[3]))
+
+
+def iter_rows(rows, xcol=0, ycol=1, block=ROW_BLOCK):
+    """
+    Parse delimited rows into (xs, ys, cs) chunks of up to block rows
+
+    rows is any iterable of lines, read with the csv module. xs and ys
+    are array('d'); cs holds the colour column when plotting the first
+    two columns of rows that have a third, and is None otherwise.
+    """
+    xi = yi = None
+    has_colours = False
+    xs, ys, cs = array('d'), array('d'), []
+    for fields in csv.reader(rows):
+        if not "".join(fields).strip():
+            continue
+        if xi is None:
+            xi, yi, header = group_columns([field.strip() for field in fields], xcol, ycol)
+            has_colours = (xcol, ycol) == (0, 1) and len(fields) > 2
+            if header:
+                continue
+        xs.append(float(fields[xi]))
+        ys.append(float(fields[yi]))
+        if has_colours:
+            cs.append(fields[2].strip())
+        if len(xs) >= block:
+            yield xs, ys, (cs if has_colours else None)
+            xs, ys, cs = array('d'), array('d'), []
+    if xs:
+        yield xs, ys, (cs if has_colours else None)
+
+
+def iter_xy_chunks(f, xcol=0, ycol=1):
+    """
+    Stream a path or iterable of delimited rows as (xs, ys, cs) chunks
+
+    Files of plain numbers are read in memory-mapped blocks, starting
+    past the header if there is one; rows with a colour column and
+    anything that is not a path go through iter_rows.
+    """
+    if not isinstance(f, str):
+        for chunk in iter_rows(f, xcol, ycol):
+            yield chunk
+        return
+
+    fields, offset = first_row(f)
+    if not fields:
+        return
+    xi, yi, header = group_columns(fields, xcol, ycol)
+    if (xcol, ycol) == (0, 1) and len(fields) > 2:
+        with open(f, newline='') as fh:
+            for chunk in iter_rows(fh, xcol, ycol):
+                yield chunk
+        return
+    for x_chunk, y_chunk in iter_column_chunks(f, (xi, yi), start=offset if header else 0):
+        yield x_chunk, y_chunk, None
+
+
+def read_columns(f, xcol=0, ycol=1):
+    """
+    Read the x and y (and colour) columns of a path or iterable of rows
+
+    The input is streamed once into compact arrays, working out the scale
+    bounds on the way. Returns (xs, ys, cs, bounds), see iter_rows and
+    update_bounds.
+    """
+    xs, ys, cs, bounds = array('d'), array('d'), None, None
+    for x_chunk, y_chunk, c_chunk in iter_xy_chunks(f, xcol, ycol):
+        xs.extend(x_chunk)
+        ys.extend(y_chunk)
+        if c_chunk is not None:
+            if cs is None:
+                cs = []
+            cs.extend(c_chunk)
+        bounds = update_bounds(bounds, x_chunk, y_chunk)
+    return xs, ys, cs, bounds
+
+
+def xy_chunks(f, xs=None, ys=None, xcol=0, ycol=1):
+    """
+    Return a function that yields the x,y input as (xs, ys) array chunks
+
+    Each call reads the input again from the start: paths are re-read and
+    sequences of rows re-parsed block by block. One-shot streams (e.g.
+    stdin) are spooled to a temporary file of raw floats on the first
+    call, see spool_chunks, so no more than a chunk of points is held in
+    memory whatever the input.
+    """
+    if f:
+        if isinstance(f, str) or iter(f) is not f:
+            return lambda: ((x, y) for x, y, _ in iter_xy_chunks(f, xcol, ycol))
+        return spool_chunks((x, y) for x, y, _ in iter_xy_chunks(f, xcol, ycol))
+    if isinstance(xs, str) and isinstance(ys, str):
+        return lambda: zip_chunks(iter_number_chunks(xs), iter_number_chunks(ys))
+    return lambda: iter([(xs, ys)])
+
+
+def spool_chunks(chunks):
+    """
+    Write (xs, ys) chunks to a temporary file, returning a function that reads them back
+
+    The chunks are stored as raw float64, so reading them again costs no
+    parsing; the file is removed once the returned function is dropped.
+    """
+    import tempfile
+
+    spool = tempfile.TemporaryFile()
+    sizes = []
+    for x_chunk, y_chunk in chunks:
+        array('d', x_chunk).tofile(spool)
+        array('d', y_chunk).tofile(spool)
+        sizes.append(len(x_chunk))
+
+    def read():
+        spool.seek(0)
+        for n in sizes:
+            xs, ys = array('d'), array('d')
+            xs.fromfile(spool, n)
+            ys.fromfile(spool, n)
+            yield xs, ys
+    return read
+
+
+def sample_columns(f, xs=None, ys=None, xcol=0, ycol=1, sample=10000, seed=None):
+    """
+    Reservoir sample the points of the input in one pass
+
+    Like read_columns, returns (xs, ys, cs, bounds), but with at most
+    sample points kept; the bounds are still those of every point, so
+    the axes match a plot of the whole input.
+    """
+    if f:
+        chunks = iter_xy_chunks(f, xcol, ycol)
+    elif isinstance(xs, str) and isinstance(ys, str):
+        chunks = ((x, y, None) for x, y in zip_chunks(iter_number_chunks(xs), iter_number_chunks(ys)))
+    else:
+        chunks = iter([(xs, ys, None)])
+
+    reservoir = bounds = None
+    for x_chunk, y_chunk, c_chunk in chunks:
+        columns = (x_chunk, y_chunk) if c_chunk is None else (x_chunk, y_chunk, c_chunk)
+        if reservoir is None:
+            reservoir = Reservoir(sample, seed, len(columns))
+        reservoir.extend(*columns)
+        bounds = update_bounds(bounds, x_chunk, y_chunk)
+    if bounds is None:
+        raise NoDataError("no points to plot")
+    columns = reservoir.columns
+    return columns[0], columns[1], (columns[2] if len(columns) > 2 else None), bounds
+
+
+def render_scatter(f, xs, ys, size, pch, colour, title, xtitle=None, ytitle=None, backend="python", density=False, xcol=0, ycol=1, cache=None, sample=None, seed=None, out=None):
+    """
+    Make a scatterplot and return it as a string instead of printing it
 
     Arguments:
-        f -- comma delimited file w/ x,y coordinates
-        xs -- if f not specified this is a file w/ x coordinates
-        ys -- if f not specified this is a filew / y coordinates
+        f -- comma delimited file (or rows) w/ x,y coordinates
+        xs -- if f not specified this is a file w/ x coordinates (or the x values)
+        ys -- if f not specified this is a filew / y coordinates (or the y values)
         size -- size of the plot
         pch -- shape of the points (any character)
         colour -- colour of the points
         title -- title of the plot
         xtitle -- x axis title of the plot
         ytitle -- y axis title of the plot
+        backend -- "python", "numpy" or "auto" (numpy falls back to python if missing)
+        density -- stream the points into per-cell counts and shade cells by density
+        xcol -- index or header name of the x column in f
+        ycol -- index or header name of the y column in f
+        cache -- True, a directory or a RenderCache to reuse plots of unchanged files
+        sample -- plot a reservoir sample of this many points (the axes still cover every point)
+        seed -- random seed for a repeatable sample
+        out -- optional file-like object the plot is also written to
+    """
+    cache = get_cache(cache)
+    if sample and seed is None:
+        # an unseeded sample is meant to differ from one plot to the next
+        cache = None
+    if cache is None:
+        graph_string = draw_scatter(f, xs, ys, size, pch, colour, title, xtitle, ytitle,
+                                    backend, density, xcol, ycol, sample, seed)
+    else:
+        key = cache.key("scatter", f or [xs, ys], (size, pch, colour, title, xtitle, ytitle,
+                                                   backend, density, xcol, ycol, sample, seed))
+        graph_string = cache.lookup(key, lambda: draw_scatter(
+            f, xs, ys, size, pch, colour, title, xtitle, ytitle, backend, density, xcol, ycol,
+            sample, seed))
+    if out is not None:
+        out.write(graph_string)
+    return graph_string
+
+
+def draw_scatter(f, xs, ys, size, pch, colour, title, xtitle=None, ytitle=None, backend="python", density=False, xcol=0, ycol=1, sample=None, seed=None):
+    """
+    Read the points and lay out the scatterplot, see render_scatter
     """
-    cs = None
+    if sample:
+        xs, ys, cs, bounds = sample_columns(f, xs, ys, xcol, ycol, sample, seed)
+        if density:
+            return build_density(lambda: iter([(xs, ys)]), size, colour, title, xtitle, ytitle, bounds=bounds)
+        return build_scatter(xs, ys, size, pch, colour, title, cs, xtitle, ytitle, bounds)
+
+    if density:
+        return build_density(xy_chunks(f, xs, ys, xcol, ycol), size, colour, title, xtitle, ytitle)
+
+    cs = bounds = None
+    use_numpy = resolve_backend(backend) == "numpy"
+    if f and use_numpy and (xcol, ycol) == (0, 1):
+        if not isinstance(f, str):
+            f = list(f)
+        data = numpy_backend.load_columns(f, 2)
+        if data is not None:
+            xs, ys = data[:, 0].tolist(), data[:, 1].tolist()
+            f = None
     if f:
-        if isinstance(f, str):
-            with open(f) as fh:
-                data = [tuple(line.strip().split(',')) for line in fh]
-        else:
-            data = [tuple(line.strip().split(',')) for line in f]
-        xs = [float(i[0]) for i in data]
-        ys = [float(i[1]) for i in data]
-        if len(data[0]) > 2:
-            cs = [i[2].strip() for i in data]
-    elif isinstance(xs, list) and isinstance(ys, list):
+        xs, ys, cs, bounds = read_columns(f, xcol, ycol)
+        if bounds is None:
+            raise NoDataError("no points to plot")
+    elif not isinstance(xs, str) and not isinstance(ys, str):
         pass
+    elif use_numpy:
+        xs = numpy_backend.load_numbers(xs).tolist()
+        ys = numpy_backend.load_numbers(ys).tolist()
+    else:
+        xs = read_column(xs)
+        ys = read_column(ys)
+
+    return build_scatter(xs, ys, size, pch, colour, title, cs, xtitle, ytitle, bounds)
+
+
+def scatter_data(f, xs=None, ys=None, size=20, xcol=0, ycol=1, cache=None, sample=None, seed=None):
+    """
+    The grid occupancy and summary of a scatterplot, without drawing it
+
+    Takes the input arguments of plot_scatter. The points are streamed
+    into per-cell counts (see grid_counts) and no characters are laid
+    out. Returns a dict, ready for json, of the "x" and "y" scales,
+    "counts" per cell (rows top to bottom, as drawn) and a "summary" of
+    the point count, occupied cells and bounds. With sample the counts
+    are of the sampled points, while the bounds still cover all of them.
+    """
+    cache = get_cache(cache)
+    if cache is not None and not (sample and seed is None):
+        key = cache.key("scatter-data", f or [xs, ys], (size, xcol, ycol, sample, seed))
+        return cache.lookup(key, lambda: scatter_data(f, xs, ys, size, xcol, ycol, None, sample, seed))
+
+    bounds = None
+    if sample:
+        xs, ys, _, bounds = sample_columns(f, xs, ys, xcol, ycol, sample, seed)
+        chunks = lambda: iter([(xs, ys)])
     else:
-        with open(xs) as fh:
-            xs = [float(str(row).strip()) for row in fh]
-        with open(ys) as fh:
-            ys = [float(str(row).strip()) for row in fh]
+        chunks = xy_chunks(f, xs, ys, xcol, ycol)
+    x_scale, y_scale, counts, bounds = grid_counts(chunks, size, bounds)
 
-    graph_string = build_scatter(xs, ys, size, pch, colour, title, cs, xtitle, ytitle)
-    print(graph_string)
-    
+    x_min, x_max, y_min, y_max = bounds
+    summary = {"points": sum(map(sum, counts)),
+               "occupied_cells": sum(1 for row in counts for count in row if count),
+               "cells": len(x_scale) * len(y_scale),
+               "x_min": x_min, "x_max": x_max, "y_min": y_min, "y_max": y_max}
+    return {"x": x_scale, "y": y_scale, "counts": counts, "summary": summary}
+
+
+def format_scatter_data(data, output_format="json"):
+    """
+    Write out scatter_data as "json", or as "csv" rows of x,y,count per cell then the summary
+    """
+    rows = ((x, y, count) for y, row in zip(data["y"], data["counts"]) for x, count in zip(data["x"], row))
+    return dumps(data, output_format, ["x", "y", "count"], rows)
 
 
-def main():
+def plot_scatter(f, xs, ys, size, pch, colour, title, xtitle=None, ytitle=None, backend="python", density=False, xcol=0, ycol=1, cache=None, sample=None, seed=None):
+    """
+    Form a complex number.
+
+    Arguments:
+        f -- comma delimited file (or rows) w/ x,y coordinates
+        xs -- if f not specified this is a file w/ x coordinates (or the x values)
+        ys -- if f not specified this is a filew / y coordinates (or the y values)
+        size -- size of the plot
+        pch -- shape of the points (any character)
+        colour -- colour of the points
+        title -- title of the plot
+        xtitle -- x axis title of the plot
+        ytitle -- y axis title of the plot
+        backend -- "python", "numpy" or "auto" (numpy falls back to python if missing)
+        density -- stream the points into per-cell counts and shade cells by density
+        xcol -- index or header name of the x column in f
+        ycol -- index or header name of the y column in f
+        cache -- True, a directory or a RenderCache to reuse plots of unchanged files
+        sample -- plot a reservoir sample of this many points (the axes still cover every point)
+        seed -- random seed for a repeatable sample
+    """
+    print(render_scatter(f, xs, ys, size, pch, colour, title, xtitle, ytitle, backend, density, xcol, ycol,
+                         cache, sample, seed))
+
 
-    parser = optparse.OptionParser(usage=scatter['usage'])
+def parse_args(argv=None, out=None, err=None, cwd=None):
+    """
+    Parse the scatter command line into (opts, args)
+    """
+    parser = CommandParser(usage=scatter['usage'], prog='scatter', out=out, err=err, cwd=cwd)
 
-    parser.add_option('-f', '--file', help='a csv w/ x and y coordinates', default=None, dest='f')
+    parser.add_option('-f', '--file', help='a csv w/ x and y coordinates', default=None, type='path', dest='f')
     parser.add_option('-t', '--title', help='title for the chart', default="", dest='t')
-    parser.add_option('-x', help='x coordinates', default=None, dest='x')
-    parser.add_option('-y', help='y coordinates', default=None, dest='y')
+    parser.add_option('-x', help='x coordinates', default=None, type='path', dest='x')
+    parser.add_option('-y', help='y coordinates', default=None, type='path', dest='y')
     parser.add_option('-s', '--size', help='y coordinates', default=20, dest='size', type='int')
     parser.add_option('-p', '--pch', help='shape of point', default="x", dest='pch')
-    parser.add_option('h', '--xtitle', help='title for x axis', default=None, dest='h')
-    parser.add_option('v', '--ytitle', help='title for y axis', default=None, dest='v')
+    parser.add_option('--xtitle', help='title for x axis', default=None, dest='h')
+    parser.add_option('--ytitle', help='title for y axis', default=None, dest='v')
     parser.add_option('-c', '--colour', help='colour of the plot (%s)' %
                       colour_help, default='default', dest='colour')
+    parser.add_option('--backend', help='parsing backend (%s)' % backend_help,
+                      type='choice', choices=list(backends), default='python', dest='backend')
+    parser.add_option('--density', help='shade cells by how many points fall in them (%r)' % density_ramp,
+                      default=False, action='store_true', dest='density')
+    parser.add_option('--xcol', help='index or header name of the x column in the csv',
+                      default='0', dest='xcol')
+    parser.add_option('--ycol', help='index or header name of the y column in the csv',
+                      default='1', dest='ycol')
+    parser.add_option('--cache-dir', help='reuse plots of unchanged files, kept in this directory',
+                      default=None, type='path', dest='cache_dir')
+    parser.add_option('--sample', help='plot a random sample of this many points (axes cover all of them)',
+                      type='int', default=None, dest='sample')
+    parser.add_option('--seed', help='random seed for --sample', type='int', default=None, dest='seed')
+    parser.add_option('--format', help='write the grid counts and summary instead of a plot (%s)' %
+                      output_format_help, type='choice', choices=list(output_formats), default='text',
+                      dest='output_format')
+
+    opts, args = parser.parse_args(argv)
+    if opts.sample is not None and opts.sample < 1:
+        parser.error("--sample needs a positive number of points")
+    return opts, args
 
-    opts, args = parser.parse_args()
+
+def run(argv=None, stdin=None, out=None, err=None, cwd=None):
+    """
+    Run the scatter command, reading stdin and writing to out when given
+    """
+    stdin = sys.stdin if stdin is None else stdin
+    out = sys.stdout if out is None else out
+    opts, args = parse_args(argv, out, err, cwd)
 
     if opts.f is None and (opts.x is None or opts.y is None):
-        opts.f = sys.stdin.readlines()
+        opts.f = stdin
 
-    if opts.f or (opts.x and opts.y):
-        plot_scatter(opts.f, opts.x, opts.y, opts.size, opts.pch, opts.colour, opts.t, opts.h, opts.v)
-    else:
-        print("nothing to plot!")
+    try:
+        if opts.output_format != "text" and (opts.f or (opts.x and opts.y)):
+            data = scatter_data(opts.f, opts.x, opts.y, opts.size, column_key(opts.xcol), column_key(opts.ycol),
+                                opts.cache_dir, opts.sample, opts.seed)
+            out.write(format_scatter_data(data, opts.output_format))
+        elif opts.f or (opts.x and opts.y):
+            render_scatter(opts.f, opts.x, opts.y, opts.size, opts.pch, opts.colour, opts.t, opts.h, opts.v,
+                           backend=opts.backend, density=opts.density,
+                           xcol=column_key(opts.xcol), ycol=column_key(opts.ycol),
+                           cache=opts.cache_dir, sample=opts.sample, seed=opts.seed, out=out)
+            out.write("\n")
+        else:
+            out.write("nothing to plot!\n")
+    except NoDataError:
+        out.write("nothing to plot!\n")
+
+
+def main(argv=None):
+    return run(argv)
 
 
 if __name__ == "__main__":
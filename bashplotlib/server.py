@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Long-running plot server for batch jobs
+
+    bashplotlib serve [--socket PATH]
+
+Keeps an interpreter warm, with the plot modules imported and the bin
+edge cache filled, and runs the hist, hbar, scatter and heatmap commands sent by
+`bashplotlib client` over a Unix domain socket. Every request runs in a
+thread of its own, so a client that keeps its stdin open does not hold
+up the others; the files a request names are found relative to the
+working directory of its client, without changing the server's own.
+"""
+
+from __future__ import print_function
+
+import io
+import os
+import sys
+import signal
+import socket
+import optparse
+import traceback
+import socketserver
+
+from .cli import commands
+from .client import connect, read_frame, socket_path, write_frame
+
+plot_commands = ("hist", "hbar", "scatter", "heatmap")
+
+
+class FrameWriter(object):
+    """
+    Text stream that sends whatever is written as frames of one kind
+    """
+
+    def __init__(self, sock, kind):
+        self.sock = sock
+        self.kind = kind
+
+    def write(self, text):
+        if text:
+            write_frame(self.sock, self.kind, text.encode())
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def run_command(cwd, argv, stdin, out, err):
+    """
+    Run a plot command with the given streams, returning its exit status
+    """
+    if not argv or argv[0] not in plot_commands:
+        err.write("bashplotlib serve: expected one of %s\n" % ", ".join(plot_commands))
+        return 2
+    module = __import__(commands[argv[0]][0], fromlist=["run"])
+    try:
+        module.run(argv[1:], stdin, out, err, cwd)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        err.write("%s\n" % e.code)
+        return 1
+    except Exception:
+        err.write(traceback.format_exc())
+        return 1
+    return 0
+
+
+class PlotHandler(socketserver.StreamRequestHandler):
+    # unbuffered, so a command tailing stdin by file descriptor sees every byte
+    rbufsize = 0
+
+    def handle(self):
+        kind, data = read_frame(self.rfile)
+        if kind != b'a':
+            return
+        fields = data.decode().split("\0")
+        stdin = io.TextIOWrapper(io.BufferedReader(self.rfile))
+        out = FrameWriter(self.connection, b'o')
+        err = FrameWriter(self.connection, b'e')
+        status = run_command(fields[0], fields[1:], stdin, out, err)
+        write_frame(self.connection, b'x', str(status).encode())
+
+
+class PlotServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    # a client still streaming its stdin must not hold up the others
+    daemon_threads = True
+
+    def server_bind(self):
+        # create the socket private to this user, with no window where it is not
+        umask = os.umask(0o077)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+
+def serve(path=None):
+    """
+    Serve plot requests on a Unix socket until interrupted
+    """
+    path = socket_path(path)
+    if os.path.exists(path):
+        try:
+            connect(path).close()
+        except socket.error:
+            os.remove(path)
+        else:
+            raise RuntimeError("a server is already listening on %s" % path)
+
+    server = PlotServer(path, PlotHandler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage="bashplotlib serve [--socket PATH]")
+    parser.add_option('--socket', help='path of the Unix socket (default %s)' % socket_path(),
+                      default=None, dest='socket')
+    opts, args = parser.parse_args(argv)
+
+    # import the plot commands up front so the first request is as quick as the rest
+    for name in plot_commands:
+        __import__(commands[name][0])
+
+    # exit through serve() on SIGTERM too, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print("serving on %s" % socket_path(opts.socket), file=sys.stderr)
+    try:
+        serve(opts.socket)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
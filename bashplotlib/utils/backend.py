@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Optional NumPy backend for reading, summarising and binning numbers
+
+NumPy is imported lazily the first time it is asked for, so plots that
+stick to the pure python backend never pay for the import.
+"""
+
+from __future__ import division
+
+backends = ("python", "numpy", "auto")
+backend_help = ', '.join(backends)
+
+_numpy = None
+
+
+def get_numpy():
+    """
+    Return the numpy module, or None if it is not installed
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def resolve_backend(backend):
+    """
+    Pick the backend to use, quietly falling back to python without numpy
+    """
+    if backend is None:
+        backend = "python"
+    if backend not in backends:
+        raise ValueError("unknown backend %r (expected one of %s)" % (backend, backend_help))
+    if backend == "python":
+        return backend
+    return "numpy" if get_numpy() is not None else "python"
+
+
+def load_numbers(f, input_format="text"):
+    """
+    Parse a path, file object or iterable of numbers into a float64 array
+
+    input_format "f64" and "f32" read raw little-endian floats and "npy"
+    a saved numpy array.
+    """
+    np = get_numpy()
+    if input_format == "npy":
+        return np.load(f if isinstance(f, str) else getattr(f, 'buffer', f)).astype(np.float64).ravel()
+    if input_format in ("f64", "f32"):
+        dtype = '<f8' if input_format == "f64" else '<f4'
+        if isinstance(f, str):
+            values = np.fromfile(f, dtype=dtype)
+        else:
+            values = np.frombuffer(getattr(f, 'buffer', f).read(), dtype=dtype)
+        return values.astype(np.float64)
+    if isinstance(f, str):
+        with open(f, 'rb') as fh:
+            return parse_text(fh.read())
+    if hasattr(f, 'read'):
+        return parse_text(f.read())
+    if isinstance(f, np.ndarray):
+        return f.astype(np.float64, copy=False).ravel()
+    return np.asarray(list(f), dtype=np.float64)
+
+
+def parse_text(text):
+    """
+    Parse whitespace separated numbers (str or bytes) into a float64 array
+
+    np.fromstring parses in C without building a list of tokens first.
+    Raises ValueError on anything that is not a number.
+    """
+    import warnings
+
+    np = get_numpy()
+    if not text.strip():
+        # fromstring reads blank input as [-1.]
+        return np.empty(0)
+    with warnings.catch_warnings():
+        # numpy < 2 only warns and stops at the first bad token
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(text, sep=' ')
+        except DeprecationWarning as e:
+            raise ValueError(str(e))
+
+
+def load_columns(f, ncols=2, delimiter=','):
+    """
+    Parse a path or sequence of delimited rows into a (rows, ncols) array
+
+    Returns None when the rows do not hold exactly ncols numeric columns
+    (e.g. scatter input with a colour column), so callers can fall back.
+    """
+    import warnings
+
+    np = get_numpy()
+    with warnings.catch_warnings():
+        # empty input is reported by the shape check below
+        warnings.simplefilter("ignore", UserWarning)
+        try:
+            values = np.loadtxt(f, dtype=np.float64, delimiter=delimiter, comments=None, ndmin=2)
+        except ValueError:
+            return None
+    if not values.size or values.shape[1] != ncols:
+        return None
+    return values
+
+
+def histogram_counts(values, calc_bins, bincount=None, binwidth=None):
+    """
+    Vectorised equivalent of histogram.histogram_counts
+
+    values is a float64 array, calc_bins the histogram bin edge generator.
+    Counts follow the same rule as utils.binning.bin_numbers.
+    """
+    from .helpers import NoDataError
+    from .stats import RunningStats
+
+    np = get_numpy()
+    n = int(values.size)
+    if not n:
+        raise NoDataError("no values to plot")
+    min_val, max_val = float(values.min()), float(values.max())
+    variance = float(values.var(ddof=1)) if n > 1 else 0.0
+    stats = RunningStats.from_summary(n, min_val, max_val, float(values.mean()), variance)
+
+    bins = list(calc_bins(n, min_val, max_val, bincount, binwidth))
+    edges = np.asarray(bins, dtype=np.float64)
+    idx = np.searchsorted(edges, values, side='left')
+    inside = idx < len(bins)
+    hist = np.bincount(idx[inside], minlength=len(bins))
+    if max_val > bins[-1]:
+        hist[-1] += int(np.count_nonzero(values == max_val))
+    return bins, hist.tolist(), stats
+
+
+def quantiles(values, qs):
+    """
+    Exact quantiles of a float64 array, by numpy's partial sort (introselect)
+    """
+    return [float(v) for v in get_numpy().quantile(values, qs)]
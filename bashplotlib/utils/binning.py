@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Bin assignment for bashplotlib histograms
+"""
+
+from __future__ import division
+
+import math
+from bisect import bisect_left
+
+# below this many edges a C-level bisect beats the arithmetic lookup
+ARITHMETIC_MIN_BINS = 128
+
+
+def is_uniform(bins, rel_tol=1e-3):
+    """
+    Check whether bin edges are (close to) evenly spaced
+    """
+    if len(bins) < 2:
+        return False
+    lo = bins[0]
+    width = (bins[-1] - lo) / (len(bins) - 1)
+    if not width > 0:
+        return False
+    tol = width * rel_tol
+    return all(abs(b - (lo + i * width)) <= tol for i, b in enumerate(bins))
+
+
+def bin_numbers(numbers, bins, max_val):
+    """
+    Count how many numbers fall into each bin
+
+    A number belongs to the first bin whose edge is >= the number. Numbers
+    past the last edge are dropped, except max_val which is counted in the
+    last bin. nan and infinite numbers are not counted. Many evenly spaced
+    edges are located arithmetically in O(1) per number, anything else
+    with an O(log B) bisect.
+    """
+    last = len(bins) - 1
+    hist = [0] * len(bins)
+
+    if len(bins) >= ARITHMETIC_MIN_BINS and is_uniform(bins):
+        lo = bins[0]
+        scale = last / (bins[last] - lo)
+        ceil = math.ceil
+        for number in numbers:
+            try:
+                i = int(ceil((number - lo) * scale))
+            except (ValueError, OverflowError):
+                # nan or infinite
+                continue
+            if i > last:
+                i = last
+            elif i < 0:
+                i = 0
+            # the edges are only approximately uniform, nudge the guess
+            # onto the exact bin so counts match a linear scan
+            if number > bins[i]:
+                i += 1
+                while i <= last and number > bins[i]:
+                    i += 1
+            else:
+                while i > 0 and number <= bins[i - 1]:
+                    i -= 1
+            if i > last:
+                if number == max_val:
+                    hist[last] += 1
+                continue
+            hist[i] += 1
+    else:
+        isfinite = math.isfinite
+        for number in numbers:
+            i = bisect_left(bins, number)
+            if (i == 0 or i > last) and not isfinite(number):
+                # nan and -inf bisect to the first bin, inf past the last
+                continue
+            if i > last:
+                if number == max_val:
+                    hist[last] += 1
+                continue
+            hist[i] += 1
+
+    return hist
+
+
+def bin_weighted(pairs, bins, max_val):
+    """
+    Sum the weights of (number, weight) pairs into bins
+
+    Uses the same bin rule as bin_numbers.
+    """
+    last = len(bins) - 1
+    hist = [0] * len(bins)
+    for number, weight in pairs:
+        i = bisect_left(bins, number)
+        if (i == 0 or i > last) and not math.isfinite(number):
+            continue
+        if i > last:
+            if number == max_val:
+                hist[last] += weight
+            continue
+        hist[i] += weight
+    return hist
+
+
+class AdaptiveHistogram(object):
+    """
+    Fixed-size histogram whose range grows as values arrive
+
+    The first few values are held back to pick a starting range. After
+    that every value is counted in O(1); a value outside the range doubles
+    the bin width and merges neighbouring bins, anchored at the far end,
+    until it fits. Memory stays at bincount counters.
+    """
+
+    def __init__(self, bincount=20, warmup=100):
+        self.bincount = bincount + bincount % 2
+        self.warmup = warmup
+        self.counts = [0] * self.bincount
+        self.lo = None
+        self.width = None
+        self.pending = []
+
+    @property
+    def hi(self):
+        return self.lo + self.bincount * self.width
+
+    def add(self, x):
+        """
+        Count a single value
+        """
+        if self.lo is None:
+            self.pending.append(x)
+            if len(self.pending) >= self.warmup:
+                self.start()
+            return
+        while x < self.lo or x > self.hi:
+            self.grow(x < self.lo)
+        i = int((x - self.lo) / self.width)
+        self.counts[min(i, self.bincount - 1)] += 1
+
+    def start(self):
+        """
+        Fix the starting range from the values held back so far
+        """
+        if self.lo is not None or not self.pending:
+            return
+        lo, hi = min(self.pending), max(self.pending)
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        self.lo, self.width = lo, (hi - lo) / self.bincount
+        pending, self.pending = self.pending, []
+        for x in pending:
+            self.add(x)
+
+    def grow(self, downwards=False):
+        """
+        Double the bin width, extending the range below or above
+        """
+        half = self.bincount // 2
+        merged = [self.counts[2 * k] + self.counts[2 * k + 1] for k in range(half)]
+        if downwards:
+            self.counts = [0] * half + merged
+            self.lo -= self.bincount * self.width
+        else:
+            self.counts = merged + [0] * half
+        self.width *= 2
+
+    def bins(self):
+        """
+        Upper edge of every bin
+        """
+        self.start()
+        return [self.lo + (i + 1) * self.width for i in range(self.bincount)]
+
+
+class AdaptiveGrid(object):
+    """
+    Fixed-size 2D histogram whose ranges grow as points arrive
+
+    AdaptiveHistogram in two dimensions: the first warmup points pick the
+    starting x and y ranges, after which an axis that a point falls
+    outside of doubles its cell width, merging neighbouring columns (or
+    rows), until the point fits. Memory stays at cols x rows counters
+    however many points are added, e.g. a whole day of timestamped values.
+    """
+
+    def __init__(self, cols=60, rows=20, warmup=1000):
+        self.cols = cols + cols % 2
+        self.rows = rows + rows % 2
+        self.warmup = warmup
+        self.counts = [[0] * self.rows for _ in range(self.cols)]
+        self.x_lo = self.x_width = None
+        self.y_lo = self.y_width = None
+        self.pending = []
+        # the range of the points themselves, within the grid
+        self.bounds = None
+
+    @property
+    def x_hi(self):
+        return self.x_lo + self.cols * self.x_width
+
+    @property
+    def y_hi(self):
+        return self.y_lo + self.rows * self.y_width
+
+    def add(self, x, y):
+        """
+        Count a single point
+        """
+        self.extend((x,), (y,))
+
+    def extend(self, xs, ys):
+        """
+        Count every point of two equal length sequences
+
+        The grid is grown once per call to take in the whole block, then
+        each point is placed arithmetically.
+        """
+        if not len(xs):
+            return
+        if self.x_lo is None:
+            self.pending.extend(zip(xs, ys))
+            if len(self.pending) >= self.warmup:
+                self.start()
+            return
+
+        x_min, x_max, y_min, y_max = min(xs), max(xs), min(ys), max(ys)
+        while x_min < self.x_lo or x_max > self.x_hi:
+            self.grow_x(x_min < self.x_lo)
+        while y_min < self.y_lo or y_max > self.y_hi:
+            self.grow_y(y_min < self.y_lo)
+        if self.bounds is None:
+            self.bounds = (x_min, x_max, y_min, y_max)
+        else:
+            self.bounds = (min(self.bounds[0], x_min), max(self.bounds[1], x_max),
+                           min(self.bounds[2], y_min), max(self.bounds[3], y_max))
+
+        counts = self.counts
+        x_lo, x_width, last_col = self.x_lo, self.x_width, self.cols - 1
+        y_lo, y_width, last_row = self.y_lo, self.y_width, self.rows - 1
+        for x, y in zip(xs, ys):
+            i = int((x - x_lo) / x_width)
+            j = int((y - y_lo) / y_width)
+            counts[i if i < last_col else last_col][j if j < last_row else last_row] += 1
+
+    def start(self):
+        """
+        Fix the starting ranges from the points held back so far
+        """
+        if self.x_lo is not None or not self.pending:
+            return
+        xs = [x for x, _ in self.pending]
+        ys = [y for _, y in self.pending]
+        self.pending = []
+        self.x_lo, self.x_width = self.starting_range(xs, self.cols)
+        self.y_lo, self.y_width = self.starting_range(ys, self.rows)
+        self.extend(xs, ys)
+
+    @staticmethod
+    def starting_range(values, cells):
+        lo, hi = min(values), max(values)
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        return lo, (hi - lo) / cells
+
+    def grow_x(self, downwards=False):
+        """
+        Double the column width, extending the range left or right
+        """
+        half = self.cols // 2
+        counts = self.counts
+        merged = [[a + b for a, b in zip(counts[2 * k], counts[2 * k + 1])] for k in range(half)]
+        empty = [[0] * self.rows for _ in range(half)]
+        if downwards:
+            self.counts = empty + merged
+            self.x_lo -= self.cols * self.x_width
+        else:
+            self.counts = merged + empty
+        self.x_width *= 2
+
+    def grow_y(self, downwards=False):
+        """
+        Double the row height, extending the range down or up
+        """
+        half = self.rows // 2
+        for i, column in enumerate(self.counts):
+            merged = [column[2 * k] + column[2 * k + 1] for k in range(half)]
+            self.counts[i] = [0] * half + merged if downwards else merged + [0] * half
+        if downwards:
+            self.y_lo -= self.rows * self.y_width
+        self.y_width *= 2
+
+    def span(self):
+        """
+        The (first, last) column and (first, last) row holding the points
+        """
+        self.start()
+        if self.bounds is None:
+            return None
+        x_min, x_max, y_min, y_max = self.bounds
+        cell = lambda v, lo, width, last: min(int((v - lo) / width), last)
+        return ((cell(x_min, self.x_lo, self.x_width, self.cols - 1),
+                 cell(x_max, self.x_lo, self.x_width, self.cols - 1)),
+                (cell(y_min, self.y_lo, self.y_width, self.rows - 1),
+                 cell(y_max, self.y_lo, self.y_width, self.rows - 1)))
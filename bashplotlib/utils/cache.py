@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Cache of computed bin counts and rendered charts
+"""
+
+import os
+from collections import OrderedDict
+
+
+class RenderCache(object):
+    """
+    Size-limited LRU of plot results, optionally persisted to a directory
+
+    Entries are keyed on the identity of the input file -- its path, size
+    and modification time, or a hash of its content with hash_content --
+    and the options that shaped the result, so plotting an unchanged file
+    again is answered without reading it. Values are anything json can
+    store, e.g. bin counts with their summary statistics or finished text.
+
+    At most max_entries entries and max_bytes bytes (of json) are kept in
+    memory, the least recently used being dropped first. With a directory
+    every entry is also written there as a json file, so it outlives the
+    process; the directory is trimmed to max_bytes the same way.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=1 << 24, directory=None, hash_content=False):
+        import threading
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hash_content = hash_content
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def input_key(self, f):
+        """
+        Identity of a plot input, or None when it can't be cached
+
+        Only files given by path (or a list of paths) are cached; streams
+        and values in memory are read every time.
+        """
+        paths = [f] if isinstance(f, str) else f
+        if not isinstance(paths, (list, tuple)) or not paths:
+            return None
+        identity = []
+        for path in paths:
+            if not isinstance(path, str):
+                return None
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            if self.hash_content:
+                identity.append((os.path.abspath(path), file_digest(path)))
+            else:
+                identity.append((os.path.abspath(path), st.st_size, st.st_mtime_ns))
+        return identity
+
+    def key(self, kind, f, options):
+        """
+        Cache key for a result of the given kind computed from f with options
+
+        Returns None when f can't be cached.
+        """
+        import hashlib
+
+        identity = self.input_key(f)
+        if identity is None:
+            return None
+        return hashlib.sha1(repr((kind, identity, options)).encode()).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """
+        The value stored under key, or None
+        """
+        import json
+
+        with self.lock:
+            text = self.entries.get(key)
+            if text is not None:
+                self.entries.move_to_end(key)
+        from_disk = False
+        if text is None and self.directory:
+            path = self.entry_path(key)
+            try:
+                with open(path) as fh:
+                    text = fh.read()
+                # the modification time orders entries when trimming
+                os.utime(path)
+            except (IOError, OSError):
+                text = None
+            from_disk = True
+        value = None
+        if text is not None:
+            try:
+                value = json.loads(text)
+            except ValueError:
+                # e.g. a file left half written by a process that died
+                text = None
+        with self.lock:
+            if text is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if from_disk:
+            self.remember(key, text)
+        return value
+
+    def put(self, key, value):
+        """
+        Store value under key
+        """
+        import json
+        import tempfile
+
+        text = json.dumps(value)
+        self.remember(key, text)
+        if self.directory:
+            # a file of its own per write, as threads and processes may store the same key at once
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, 'w') as fh:
+                fh.write(text)
+            os.replace(tmp, self.entry_path(key))
+            self.trim_directory()
+
+    def remember(self, key, text):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = text
+            self.size += len(text)
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                self.size -= len(self.entries.popitem(last=False)[1])
+
+    def trim_directory(self):
+        """
+        Remove the least recently used files until the directory fits max_bytes
+        """
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, path, st.st_size))
+            total += st.st_size
+        files.sort()
+        while files and (total > self.max_bytes or len(files) > self.max_entries):
+            _, path, size = files.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def lookup(self, key, compute):
+        """
+        The value stored under key, computing and storing it on a miss
+
+        With key None (an input that can't be cached) compute is just called.
+        """
+        if key is None:
+            return compute()
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+        Empty the cache, including its directory
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+def file_digest(path, block=1 << 20):
+    import hashlib
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for data in iter(lambda: fh.read(block), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+# caches handed out by get_cache, by directory (None for memory only)
+shared_caches = {}
+
+
+def get_cache(cache):
+    """
+    Resolve the cache argument of the plot functions
+
+    None or False for no caching, True for an in-memory cache shared by
+    the whole process, a directory path for a persistent cache there, or
+    a RenderCache to use as is.
+    """
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, RenderCache):
+        return cache
+    directory = None if cache is True else os.path.abspath(os.path.expanduser(cache))
+    if directory not in shared_caches:
+        shared_caches[directory] = RenderCache(directory=directory)
+    return shared_caches[directory]
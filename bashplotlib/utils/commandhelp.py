@@ -5,10 +5,19 @@
 Usage messages for bashplotlib system commands
 """
 
+import os
+import sys
+import optparse
+
 hist = {
     "usage": """hist is a command for making histograms. it accepts a series of values in one of the following formats:
         1) txt file w/ 1 column of numbers
         2) standard in piped from another command line cat or curl
+        3) several txt files (or a quoted glob) read in parallel: hist -f 'shard-*.txt'
+        4) pre-aggregated value,count rows: hist --input-format weighted -f counts.csv
+        5) raw little-endian float64/float32 or .npy arrays: hist --input-format f64 -f values.bin
+        6) several series on shared bins, one per file or by a csv column:
+           hist --series -f v1.txt -f v2.txt    hist --group version -f latency.csv --layout multiples
 
     for some examples of how to use hist, you can type the command:
         hist --demo
@@ -21,8 +30,83 @@ scatter = {
     following formats:
         1) a txt file or standard in value w/ 2 comma seperated columns of x,y values
         2) 2 txt files. 1 w/ designated x values and another with designated y values.
+        3) a csv with more columns (and optionally a header), picking columns by index or name
 
     scatter -x <xcoords> -y <ycoords>
     cat <file_with_x_and_y_coords> | scatter
+    scatter -f <csv_with_header> --xcol time --ycol latency
+    scatter --density -f <file_with_millions_of_points>
+    """
+}
+
+
+heatmap = {
+    "usage": """heatmap is a command for plotting how values are spread over time. it accepts timestamp,value rows:
+        1) a csv file or standard in w/ 2 comma seperated columns of timestamp,value
+        2) a csv with more columns (and optionally a header), picking columns by index or name
+    timestamps are seconds since the epoch (or any number) or ISO 8601 dates like 2024-05-01T12:00:00Z
+
+    heatmap -f <file_with_timestamps_and_values>
+    tail -n 100000 access.csv | heatmap --timecol time --valuecol latency -c heat
     """
 }
+
+class CommandOption(optparse.Option):
+    """
+    Option that also takes type='path', for file names
+    """
+    TYPES = optparse.Option.TYPES + ("path",)
+    TYPE_CHECKER = dict(optparse.Option.TYPE_CHECKER, path=lambda option, opt, value: value)
+
+
+class CommandParser(optparse.OptionParser):
+    """
+    OptionParser that writes its help and errors to the given streams
+
+    Lets a command run with its output going somewhere other than
+    sys.stdout and sys.stderr, e.g. back to a client over a socket. With
+    cwd, path options and the positional arguments are taken relative to
+    that directory instead of the process's own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.out = kwargs.pop('out', None)
+        self.err = kwargs.pop('err', None)
+        self.cwd = kwargs.pop('cwd', None)
+        kwargs.setdefault('option_class', CommandOption)
+        optparse.OptionParser.__init__(self, *args, **kwargs)
+
+    def parse_args(self, args=None, values=None):
+        opts, args = optparse.OptionParser.parse_args(self, args, values)
+        if self.cwd is None:
+            return opts, args
+        for option in self._get_all_options():
+            value = getattr(opts, option.dest, None) if option.type == "path" else None
+            if isinstance(value, list):
+                setattr(opts, option.dest, [self.path(v) for v in value])
+            elif value:
+                setattr(opts, option.dest, self.path(value))
+        return opts, [self.path(arg) for arg in args]
+
+    def path(self, name):
+        """
+        Path of a file named on the command line, relative to cwd
+        """
+        if self.cwd is None:
+            return name
+        return os.path.join(self.cwd, os.path.expanduser(name))
+
+    def print_usage(self, file=None):
+        optparse.OptionParser.print_usage(self, file or self.out)
+
+    def print_help(self, file=None):
+        optparse.OptionParser.print_help(self, file or self.out)
+
+    def exit(self, status=0, msg=None):
+        if msg:
+            (self.err or sys.stderr).write(msg)
+        sys.exit(status)
+
+    def error(self, msg):
+        self.print_usage(self.err or sys.stderr)
+        self.exit(2, "%s: error: %s\n" % (self.get_prog_name(), msg))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Machine-readable output of the numbers behind a plot
+"""
+
+output_formats = ("text", "json", "csv")
+output_format_help = ', '.join(output_formats)
+
+
+def dumps(data, output_format, header, rows):
+    """
+    Text of a plot's data in output_format ("json" or "csv")
+
+    data is a dict ending in a flat "summary" dict. As json it is written
+    whole, on one line; as csv the rows come first, under header, then a
+    blank line and a "statistic,value" row per entry of the summary.
+    """
+    if output_format == "json":
+        import json
+
+        return json.dumps(data) + "\n"
+    if output_format != "csv":
+        raise ValueError("unknown output format %r (expected json or csv)" % (output_format,))
+
+    import io
+    import csv
+
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(header)
+    writer.writerows(rows)
+    writer.writerow([])
+    writer.writerow(["statistic", "value"])
+    writer.writerows(data["summary"].items())
+    return buf.getvalue()
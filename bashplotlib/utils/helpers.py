@@ -6,9 +6,16 @@ Various helpful function for bashplotlib
 """
 
 import sys
+import math
 
 isiterable = lambda x: hasattr(x, '__iter__') or hasattr(x, '__getitem__')
 
+
+class NoDataError(ValueError):
+    """
+    The input holds nothing to plot
+    """
+
 bcolours = {
     "white":   '\033[97m',
     "aqua":    '\033[96m',
@@ -25,6 +32,8 @@ bcolours = {
 
 colour_help = ', '.join([colour for colour in bcolours if colour != "ENDC"])
 
+density_ramp = " .:-=+*#%@"
+
 
 def get_colour(colour):
     """
@@ -51,24 +60,87 @@ def printcolour(text, sameline=False, colour=get_colour("ENDC")):
     sys.stdout.write(get_colour(colour) + text + bcolours["ENDC"] + sep)
 
 
+def colour_text(text, colour="default"):
+    """
+    Wrap text in colour escape codes, leaving default coloured text bare
+    """
+    if not text or colour not in bcolours or colour in ("default", "ENDC"):
+        return text
+    return bcolours[colour] + text + bcolours["ENDC"]
+
+
+def colour_runs(cells):
+    """
+    Join (text, colour) pairs, emitting escape codes only where the colour changes
+    """
+    out = []
+    current = "default"
+    for text, colour in cells:
+        if colour not in bcolours or colour == "ENDC":
+            colour = "default"
+        if colour != current:
+            out.append(bcolours[colour])
+            current = colour
+        out.append(text)
+    if current != "default":
+        out.append(bcolours["ENDC"])
+    return "".join(out)
+
+
+def density_char(count, max_count, ramp=density_ramp):
+    """
+    Pick the ramp character for a cell count
+
+    Counts are placed on a log scale so a few crowded cells don't wash out
+    the rest; ramp[0] is only used for empty cells.
+    """
+    if count <= 0:
+        return ramp[0]
+    if max_count <= 1:
+        return ramp[-1]
+    level = math.log(count) / math.log(max_count)
+    return ramp[1 + int(round(level * (len(ramp) - 2)))]
+
+
+_edge_cache = {}
+EDGE_CACHE_SIZE = 512
+
+
 def drange(start, stop, step=1.0, include_stop=False):
     """
     Generate between 2 numbers w/ optional step, optionally include upper bound
+
+    Every value is computed as start + i * step rather than by repeatedly
+    adding step, so there is no drift and the upper bound is not lost to
+    rounding. Values after start are rounded to 10 significant digits of
+    the step to keep labels tidy. Results are cached and returned as a
+    tuple.
     """
     if step == 0:
         step = 0.01
-    r = start
-
-    if include_stop:
-        while r <= stop:
-            yield r
-            r += step
-            r = round(r, 10)
+    key = (start, stop, step, include_stop)
+    values = _edge_cache.get(key)
+    if values is not None:
+        return values
+
+    span = (stop - start) / float(step)
+    if span < 0:
+        values = ()
     else:
-        while r < stop:
-            yield r
-            r += step
-            r = round(r, 10)
+        # tolerate float noise in the span so stop itself is recognised
+        n = int(math.floor(span + 1e-9))
+        if not include_stop and n >= span - 1e-9:
+            n -= 1
+        ndigits = 10 - int(math.floor(math.log10(abs(step))))
+        values = (start,) + tuple(round(start + i * step, ndigits) for i in range(1, n + 1))
+        if include_stop and n >= span - 1e-9:
+            # stop falls on the grid: end on it exactly, not on a rounded neighbour
+            values = values[:-1] + (stop,)
+
+    if len(_edge_cache) >= EDGE_CACHE_SIZE:
+        _edge_cache.clear()
+    _edge_cache[key] = values
+    return values
 
 
 def abbreviate(labels, rfill=' '):
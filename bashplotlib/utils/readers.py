@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Chunked readers for large numeric input files
+"""
+
+import os
+import sys
+import mmap
+from array import array
+
+CHUNK_SIZE = 1 << 22
+ROW_BLOCK = 1 << 16
+
+input_formats = ("text", "weighted", "f64", "f32", "npy")
+input_format_help = ', '.join(input_formats)
+
+BINARY_TYPECODES = {"f64": "d", "f32": "f"}
+NPY_MAGIC = b'\x93NUMPY'
+
+
+def iter_blocks(path, chunk_size=CHUNK_SIZE, start=0, end=None):
+    """
+    Yield the bytes of a file in blocks that end on a line boundary
+
+    Regular files are memory-mapped; anything mmap refuses (empty files,
+    pipes, character devices) is read in chunks instead. start and end
+    restrict a mapped file to the lines that begin in that byte range, so
+    a file can be split between workers without cutting lines in two.
+    """
+    with open(path, 'rb') as fh:
+        try:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError, mmap.error):
+            mm = None
+
+        if mm is None:
+            if start > 0 and fh.read(start)[-1:] != b'\n':
+                fh.readline()
+            carry = b''
+            while True:
+                block = fh.read(chunk_size)
+                if not block:
+                    break
+                block = carry + block
+                cut = block.rfind(b'\n') + 1
+                if cut == 0:
+                    carry = block
+                    continue
+                carry = block[cut:]
+                yield block[:cut]
+            if carry:
+                yield carry
+            return
+
+        try:
+            size = len(mm)
+            stop = size if end is None else min(end, size)
+            if start > 0 and mm[start - 1:start] != b'\n':
+                cut = mm.find(b'\n', start)
+                start = size if cut == -1 else cut + 1
+            while start < stop:
+                target = min(start + chunk_size, stop)
+                cut = -1
+                if target < stop:
+                    cut = mm.rfind(b'\n', start, target)
+                if cut == -1:
+                    # finish the line running past the block or the range
+                    cut = mm.find(b'\n', target - 1)
+                block_end = size if cut == -1 else cut + 1
+                yield mm[start:block_end]
+                start = block_end
+        finally:
+            mm.close()
+
+
+def split_ranges(path, split_size):
+    """
+    Split a file into (path, start, end) byte ranges of about split_size
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    if size <= split_size or not os.path.isfile(path):
+        return [(path, 0, None)]
+    return [(path, start, min(start + split_size, size)) for start in range(0, size, split_size)]
+
+
+def first_row(path, delimiter=','):
+    """
+    Split the first non-blank line of a file into fields
+
+    Returns (fields, offset) where offset is the byte position just past
+    that line, or ([], 0) for a file without any.
+    """
+    offset = 0
+    with open(path, 'rb') as fh:
+        for line in fh:
+            offset += len(line)
+            if line.strip():
+                return [field.strip() for field in line.decode().split(delimiter)], offset
+    return [], 0
+
+
+def iter_number_chunks(path, chunk_size=CHUNK_SIZE, start=0, end=None):
+    """
+    Yield an array('d') of the whitespace separated numbers in each block
+    """
+    for block in iter_blocks(path, chunk_size, start, end):
+        yield array('d', map(float, block.split()))
+
+
+def iter_column_chunks(path, usecols=(0, 1), delimiter=',', chunk_size=CHUNK_SIZE, start=0):
+    """
+    Yield a tuple of array('d'), one per column in usecols, for each block
+
+    Rectangular blocks are split in one go and sliced by stride; blocks
+    with blank or ragged lines fall back to splitting line by line. start
+    is a byte offset to begin at, e.g. just past a header line.
+    """
+    delimiter = delimiter.encode()
+    ncols = None
+    for block in iter_blocks(path, chunk_size, start):
+        if ncols is None:
+            first = block.lstrip().split(b'\n', 1)[0]
+            if not first:
+                continue
+            ncols = len(first.split(delimiter))
+
+        tokens = block.replace(delimiter, b' ').split()
+        nlines = block.count(b'\n') + (not block.endswith(b'\n'))
+        if len(tokens) == ncols * nlines and block.count(delimiter) == (ncols - 1) * nlines:
+            yield tuple(array('d', map(float, tokens[c::ncols])) for c in usecols)
+            continue
+
+        columns = tuple(array('d') for _ in usecols)
+        for line in block.split(b'\n'):
+            fields = line.split(delimiter)
+            if not line.strip():
+                continue
+            for column, c in zip(columns, usecols):
+                column.append(float(fields[c]))
+        yield columns
+
+
+def iter_weighted_chunks(source, delimiter=',', chunk_size=CHUNK_SIZE):
+    """
+    Yield (values, weights) arrays from "value,weight" rows
+
+    source is a path, or an iterable of rows given either as delimited
+    lines or as (value, weight) pairs.
+    """
+    if isinstance(source, str):
+        for chunk in iter_column_chunks(source, (0, 1), delimiter, chunk_size):
+            yield chunk
+        return
+
+    rows = chunk_size // 32
+    values, weights = array('d'), array('d')
+    for row in source:
+        if isinstance(row, (str, bytes)):
+            if isinstance(row, bytes):
+                row = row.decode()
+            row = row.replace(delimiter, ' ').split()
+            if not row:
+                continue
+        value, weight = row[:2]
+        values.append(float(value))
+        weights.append(float(weight))
+        if len(values) >= rows:
+            yield values, weights
+            values, weights = array('d'), array('d')
+    if values:
+        yield values, weights
+
+
+def column_key(col):
+    """
+    Turn a column given on the command line into an index or header name
+    """
+    return int(col) if col.isdigit() else col
+
+
+def group_columns(fields, groupcol=0, valuecol=None):
+    """
+    Find the group and value column indices given the first row
+
+    Returns (gi, vi, header) where header tells whether the first row is
+    a header (named columns, or a value that is not a number).
+    """
+    names = [str(field) for field in fields]
+    indices = []
+    for col in (groupcol, valuecol):
+        if col is None:
+            col = 1 if indices[0] == 0 else 0
+        elif not isinstance(col, int):
+            if col not in names:
+                raise ValueError("no column named %r (columns: %s)" % (col, ', '.join(names)))
+            col = names.index(col)
+        if col >= len(fields):
+            raise ValueError("column %d is out of range, the input has %d columns" % (col, len(fields)))
+        indices.append(col)
+    gi, vi = indices
+    header = not isinstance(groupcol, int) or not (valuecol is None or isinstance(valuecol, int))
+    if not header:
+        try:
+            float(fields[vi])
+        except ValueError:
+            header = True
+    return gi, vi, header
+
+
+def iter_pair_chunks(rows, col_a=0, col_b=1, delimiter=',', parse_a=float, block=ROW_BLOCK):
+    """
+    Parse delimited rows into (a, b) array('d') chunks of up to block rows
+
+    Columns are picked by index or header name, as in group_columns, and
+    a header row is skipped. parse_a converts the first column (e.g.
+    timestamps); the second is read as a float.
+    """
+    ai = bi = None
+    a, b = array('d'), array('d')
+    for row in rows:
+        if isinstance(row, bytes):
+            row = row.decode()
+        if not row.strip():
+            continue
+        fields = [field.strip() for field in row.split(delimiter)]
+        if ai is None:
+            ai, bi, header = group_columns(fields, col_a, col_b)
+            if header:
+                continue
+        a.append(parse_a(fields[ai]))
+        b.append(float(fields[bi]))
+        if len(a) >= block:
+            yield a, b
+            a, b = array('d'), array('d')
+    if a:
+        yield a, b
+
+
+def read_groups(source, groupcol=0, valuecol=None, delimiter=','):
+    """
+    Split rows into one array('d') of values per group, in a single pass
+
+    source is a path, or an iterable of delimited lines or of sequences
+    such as (group, value) pairs. Columns are picked by index or header
+    name; valuecol defaults to the first column that isn't groupcol.
+    Returns a dict of group name -> values in order of first appearance.
+    """
+    if isinstance(source, str):
+        with open(source) as fh:
+            return read_groups(fh, groupcol, valuecol, delimiter)
+
+    groups = {}
+    gi = vi = None
+    for row in source:
+        if isinstance(row, bytes):
+            row = row.decode()
+        if isinstance(row, str):
+            if not row.strip():
+                continue
+            row = [field.strip() for field in row.split(delimiter)]
+        if gi is None:
+            gi, vi, header = group_columns(row, groupcol, valuecol)
+            if header:
+                continue
+        group = str(row[gi])
+        values = groups.get(group)
+        if values is None:
+            values = groups[group] = array('d')
+        values.append(float(row[vi]))
+    return groups
+
+
+def read_npy_header(fh):
+    """
+    Parse the header of a .npy file and leave fh at the first value
+
+    Returns (typecode, byteswap) for float32 and float64 arrays of any
+    shape in C order; numpy itself is not needed.
+    """
+    import ast
+    import struct
+
+    if fh.read(6) != NPY_MAGIC:
+        raise ValueError("not a .npy file")
+    major = bytearray(fh.read(2))[0]
+    fmt = '<H' if major == 1 else '<I'
+    header_len = struct.unpack(fmt, fh.read(struct.calcsize(fmt)))[0]
+    header = ast.literal_eval(fh.read(header_len).decode('latin1'))
+    descr = header['descr']
+    if not isinstance(descr, str) or descr[1:] not in ('f8', 'f4'):
+        raise ValueError("unsupported .npy dtype %r (expected float32 or float64)" % (descr,))
+    if header.get('fortran_order') and len(header.get('shape', ())) > 1:
+        raise ValueError("fortran ordered .npy arrays are not supported")
+    typecode = 'd' if descr[1:] == 'f8' else 'f'
+    little = descr[0] == '<' or (descr[0] in '=|' and sys.byteorder == 'little')
+    return typecode, little != (sys.byteorder == 'little')
+
+
+def iter_binary_chunks(source, input_format="f64", chunk_size=CHUNK_SIZE):
+    """
+    Yield array('d') or array('f') blocks of raw little-endian floats
+
+    source is a path or a binary file object; input_format is "f64",
+    "f32" or "npy".
+    """
+    close = isinstance(source, str)
+    fh = open(source, 'rb') if close else getattr(source, 'buffer', source)
+    try:
+        if input_format == "npy":
+            typecode, swap = read_npy_header(fh)
+        elif input_format in BINARY_TYPECODES:
+            typecode, swap = BINARY_TYPECODES[input_format], sys.byteorder != 'little'
+        else:
+            raise ValueError("unknown binary format %r" % (input_format,))
+        itemsize = array(typecode).itemsize
+        carry = b''
+        while True:
+            block = fh.read(chunk_size)
+            if not block:
+                break
+            block = carry + block
+            cut = len(block) - len(block) % itemsize
+            carry = block[cut:]
+            values = array(typecode)
+            values.frombytes(block[:cut])
+            if swap:
+                values.byteswap()
+            yield values
+        if carry:
+            raise ValueError("binary input ends with %d stray bytes" % len(carry))
+    finally:
+        if close:
+            fh.close()
+
+
+def zip_chunks(a_chunks, b_chunks):
+    """
+    Pair up two streams of array chunks into chunks of equal length
+
+    The streams may be split at different points (e.g. two files read in
+    byte-sized blocks); pairing stops at the end of the shorter one.
+    """
+    a_buf, b_buf = array('d'), array('d')
+    b_chunks = iter(b_chunks)
+    for a in a_chunks:
+        a_buf.extend(a)
+        while len(b_buf) < len(a_buf):
+            b = next(b_chunks, None)
+            if b is None:
+                break
+            b_buf.extend(b)
+        n = min(len(a_buf), len(b_buf))
+        if n:
+            yield a_buf[:n], b_buf[:n]
+            del a_buf[:n]
+            del b_buf[:n]
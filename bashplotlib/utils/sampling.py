@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Reservoir sampling of very large inputs
+"""
+
+from __future__ import division
+
+import math
+import random
+
+
+class Reservoir(object):
+    """
+    Uniform random sample of up to size rows from a stream of any length
+
+    Uses Algorithm L (Li 1994): once the reservoir is full, the number of
+    rows to skip before the next one is kept is drawn directly, so after
+    the first size rows the work grows with size * log(n / size) rather
+    than with n. Rows are kept as parallel columns, e.g. the x and y (and
+    colour) of scatter points. A seed makes the sample repeatable.
+    """
+
+    def __init__(self, size, seed=None, columns=1):
+        if size < 1:
+            raise ValueError("the sample size must be at least 1")
+        self.size = size
+        self.rng = random.Random(seed)
+        self.columns = [[] for _ in range(columns)]
+        self.seen = 0
+        self.w = 1.0
+        # stream position of the next row to keep, once the reservoir is full
+        self.next_index = None
+
+    def uniform(self):
+        # in (0, 1], so its log is defined
+        return 1.0 - self.rng.random()
+
+    def skip(self):
+        """
+        Draw the position of the next row that goes into the reservoir
+        """
+        self.w *= math.exp(math.log(self.uniform()) / self.size)
+        if self.w >= 1.0:
+            self.next_index += 1
+            return
+        self.next_index += int(math.floor(math.log(self.uniform()) / math.log(1.0 - self.w))) + 1
+
+    def extend(self, *chunks):
+        """
+        Offer a block of rows, given as one equal length sequence per column
+        """
+        n = len(chunks[0])
+        start = self.seen
+        columns = self.columns
+        if start < self.size:
+            take = min(n, self.size - start)
+            for column, chunk in zip(columns, chunks):
+                column.extend(chunk[:take])
+            if len(columns[0]) == self.size:
+                self.next_index = self.size - 1
+                self.skip()
+
+        if self.next_index is not None:
+            end = start + n
+            while self.next_index < end:
+                i = self.next_index - start
+                slot = self.rng.randrange(self.size)
+                for column, chunk in zip(columns, chunks):
+                    column[slot] = chunk[i]
+                self.skip()
+        self.seen += n
+
+    def add(self, *row):
+        """
+        Offer a single row
+        """
+        self.extend(*[(value,) for value in row])
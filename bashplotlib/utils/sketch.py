@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Fixed-memory, mergeable histogram sketch for unbounded streams
+"""
+
+from __future__ import division
+
+import math
+
+from .binning import bin_weighted
+from .stats import RunningStats
+
+
+class DDSketch(object):
+    """
+    Log-bucketed quantile sketch (after DDSketch, Masson et al. 2019)
+
+    Values are counted in buckets whose boundaries grow geometrically by
+    gamma = (1 + a) / (1 - a), so any value read back from the sketch is
+    within a relative error a of a true value. Once more than max_buckets
+    buckets are in use the ones closest to zero are folded together,
+    which keeps memory fixed no matter how many values are added.
+
+    Count, min, max, mean and standard deviation are tracked exactly.
+    Sketches with the same accuracy can be merged and (de)serialised,
+    so partial sketches can be built per host and combined centrally.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # smallest magnitude that gets its own bucket, anything below is zero
+        self.min_indexable = 1e-300 * self.gamma
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.stats = RunningStats()
+
+    def key(self, x):
+        """
+        Bucket key of a positive value
+        """
+        return int(math.ceil(math.log(x) / self.log_gamma))
+
+    def value(self, key):
+        """
+        Representative positive value of a bucket
+        """
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, x, weight=1):
+        """
+        Count a single value, weight times
+        """
+        if weight == 1:
+            self.stats.push(x)
+        elif weight > 0:
+            self.stats.push_weighted(x, weight)
+        else:
+            return
+        if x > self.min_indexable:
+            store = self.positive
+            k = self.key(x)
+        elif x < -self.min_indexable:
+            store = self.negative
+            k = self.key(-x)
+        else:
+            self.zero_count += weight
+            return
+        if k in store:
+            store[k] += weight
+        else:
+            store[k] = weight
+            if len(self.positive) + len(self.negative) > self.max_buckets:
+                self.collapse()
+
+    def extend(self, numbers):
+        """
+        Count every value of an iterable
+        """
+        for x in numbers:
+            self.add(x)
+        return self
+
+    def extend_weighted(self, values, weights):
+        """
+        Count every value of an iterable the matching number of times
+        """
+        for x, weight in zip(values, weights):
+            self.add(x, weight)
+        return self
+
+    def collapse(self):
+        """
+        Fold the buckets nearest zero together until within max_buckets
+        """
+        excess = len(self.positive) + len(self.negative) - self.max_buckets
+        for store in (self.negative, self.positive):
+            if excess <= 0:
+                break
+            keys = sorted(store)
+            fold = min(excess, len(keys) - 1)
+            if fold <= 0:
+                continue
+            target = keys[fold]
+            for k in keys[:fold]:
+                store[target] += store.pop(k)
+            excess -= fold
+
+    def merge(self, other):
+        """
+        Add the counts of another sketch with the same accuracy
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("can't merge sketches with different relative accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for k, count in other_store.items():
+                store[k] = store.get(k, 0) + count
+        self.zero_count += other.zero_count
+        self.stats.merge(other.stats)
+        if len(self.positive) + len(self.negative) > self.max_buckets:
+            self.collapse()
+        return self
+
+    @property
+    def count(self):
+        return self.stats.n
+
+    def buckets(self):
+        """
+        (representative value, count) of every bucket in ascending order
+        """
+        for k in sorted(self.negative, reverse=True):
+            yield -self.value(k), self.negative[k]
+        if self.zero_count:
+            yield 0.0, self.zero_count
+        for k in sorted(self.positive):
+            yield self.value(k), self.positive[k]
+
+    def quantile(self, q):
+        """
+        Approximate value at quantile q (0 <= q <= 1)
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, count in self.buckets():
+            seen += count
+            if seen > rank:
+                return min(max(value, self.stats.min_val), self.stats.max_val)
+        return self.stats.max_val
+
+    def histogram(self, bins):
+        """
+        Approximate bin counts, using the same bin rule as bin_numbers
+        """
+        lo, hi = self.stats.min_val, self.stats.max_val
+        pairs = [[min(max(value, lo), hi), count] for value, count in self.buckets()]
+        # the extreme buckets hold the exact min and max
+        if pairs:
+            pairs[0][0], pairs[-1][0] = lo, hi
+        return bin_weighted(pairs, bins, hi)
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "positive": dict((str(k), v) for k, v in self.positive.items()),
+            "negative": dict((str(k), v) for k, v in self.negative.items()),
+            "zero_count": self.zero_count,
+            "stats": self.stats.state(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"], data.get("max_buckets", 2048))
+        sketch.positive = dict((int(k), v) for k, v in data["positive"].items())
+        sketch.negative = dict((int(k), v) for k, v in data["negative"].items())
+        sketch.zero_count = data["zero_count"]
+        sketch.stats = RunningStats.from_state(data["stats"])
+        return sketch
+
+    def dumps(self):
+        import json
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def loads(cls, text):
+        import json
+        return cls.from_dict(json.loads(text))
+
+
+def load_sketches(paths):
+    """
+    Read serialised sketches from files and merge them into one
+    """
+    merged = None
+    for path in paths:
+        with open(path) as fh:
+            sketch = DDSketch.loads(fh.read())
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged
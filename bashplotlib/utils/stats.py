@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Streaming summary statistics for bashplotlib
+"""
+
+from __future__ import division
+
+import math
+import random
+
+# percentiles shown in summaries when asked for without a list
+default_percentiles = (50, 90, 99, 99.9)
+
+
+class RunningStats(object):
+    """
+    Accumulate count, min, max, mean and variance in a single pass
+
+    Uses Welford's online algorithm so values never need to be kept around.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min_val = None
+        self.max_val = None
+        # [(percentile, value), ...] when computed alongside, see quantiles
+        self.percentiles = None
+
+    @classmethod
+    def from_summary(cls, n, min_val, max_val, mean, variance):
+        """
+        Build an accumulator from precomputed summary statistics
+        """
+        stats = cls()
+        stats.n = n
+        stats.min_val, stats.max_val = min_val, max_val
+        stats.mean = mean
+        stats.m2 = variance * (n - 1) if n > 1 else 0.0
+        return stats
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Rebuild an accumulator saved with state()
+        """
+        stats = cls()
+        stats.n, stats.min_val, stats.max_val, stats.mean, stats.m2 = state[:5]
+        if len(state) > 5:
+            stats.percentiles = [tuple(pair) for pair in state[5]]
+        return stats
+
+    def state(self):
+        """
+        The accumulator as a plain list, for serialising
+        """
+        state = [self.n, self.min_val, self.max_val, self.mean, self.m2]
+        if self.percentiles is not None:
+            state.append([list(pair) for pair in self.percentiles])
+        return state
+
+    def push(self, x):
+        """
+        Add a single value
+        """
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        if self.min_val is None or x < self.min_val:
+            self.min_val = x
+        if self.max_val is None or x > self.max_val:
+            self.max_val = x
+
+    def extend(self, numbers):
+        """
+        Add every value of an iterable
+
+        Sized blocks (lists, arrays) are summarised as a whole and merged in,
+        which is much cheaper than pushing their values one at a time.
+        """
+        if not hasattr(numbers, '__len__'):
+            for x in numbers:
+                self.push(x)
+            return self
+        if not len(numbers):
+            return self
+        n = len(numbers)
+        mean = math.fsum(numbers) / n
+        m2 = math.fsum([(x - mean) ** 2 for x in numbers])
+        block = RunningStats.from_summary(n, min(numbers), max(numbers), mean, 0.0)
+        block.m2 = m2
+        return self.merge(block)
+
+    def push_weighted(self, x, weight):
+        """
+        Add a value that was observed weight times (weighted Welford update)
+        """
+        if weight <= 0:
+            return
+        self.n += weight
+        delta = x - self.mean
+        self.mean += delta * weight / self.n
+        self.m2 += weight * delta * (x - self.mean)
+        if self.min_val is None or x < self.min_val:
+            self.min_val = x
+        if self.max_val is None or x > self.max_val:
+            self.max_val = x
+
+    def extend_weighted(self, values, weights):
+        """
+        Add a block of values with the number of times each was observed
+
+        Values with a weight of zero or less are ignored.
+        """
+        pairs = [(x, w) for x, w in zip(values, weights) if w > 0]
+        if not pairs:
+            return self
+        n = math.fsum([w for _, w in pairs])
+        mean = math.fsum([x * w for x, w in pairs]) / n
+        m2 = math.fsum([w * (x - mean) ** 2 for x, w in pairs])
+        xs = [x for x, _ in pairs]
+        block = RunningStats.from_summary(n, min(xs), max(xs), mean, 0.0)
+        block.m2 = m2
+        return self.merge(block)
+
+    def merge(self, other):
+        """
+        Combine with another accumulator (Chan et al. parallel update)
+        """
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            self.min_val, self.max_val = other.min_val, other.max_val
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min_val = min(self.min_val, other.min_val)
+        self.max_val = max(self.max_val, other.max_val)
+        return self
+
+    @property
+    def variance(self):
+        """
+        Sample variance (n - 1 denominator)
+        """
+        if self.n < 2:
+            return 0.0
+        return self.m2 / (self.n - 1)
+
+    @property
+    def sd(self):
+        return self.variance ** 0.5
+
+
+def select(values, ranks):
+    """
+    The values at the given 0-based ranks, as if values were sorted
+
+    Quickselect for several ranks at once: each partition splits the
+    ranks still wanted between the values below and above the pivot, and
+    only the sides holding one of them are looked at again, so the input
+    is never fully sorted. Expected O(n) time for a handful of ranks.
+    """
+    rng = random.Random(0)
+    found = {}
+    pending = [(values, sorted(set(ranks)), 0)]
+    while pending:
+        items, wanted, offset = pending.pop()
+        if len(items) <= 32:
+            ordered = sorted(items)
+            for k in wanted:
+                found[k] = ordered[k - offset]
+            continue
+        pivot = items[rng.randrange(len(items))]
+        lower = [x for x in items if x < pivot]
+        upper = [x for x in items if x > pivot]
+        lower_end = offset + len(lower)
+        upper_start = offset + len(items) - len(upper)
+        for k in wanted:
+            if lower_end <= k < upper_start:
+                found[k] = pivot
+        below = [k for k in wanted if k < lower_end]
+        above = [k for k in wanted if k >= upper_start]
+        if below:
+            pending.append((lower, below, offset))
+        if above:
+            pending.append((upper, above, upper_start))
+    return [found[k] for k in ranks]
+
+
+def quantiles(values, qs):
+    """
+    Exact quantiles (0 <= q <= 1) of a sequence of numbers, by selection
+
+    Interpolates linearly between the neighbouring order statistics, the
+    same as numpy's default method.
+    """
+    n = len(values)
+    if not n:
+        raise ValueError("no values to take quantiles of")
+    positions = [(n - 1) * q for q in qs]
+    ranks = set()
+    for h in positions:
+        lo = int(math.floor(h))
+        ranks.update([lo, min(lo + 1, n - 1)])
+    ranks = sorted(ranks)
+    order = dict(zip(ranks, select(values, ranks)))
+    result = []
+    for h in positions:
+        lo = int(math.floor(h))
+        value = order[lo]
+        if h > lo:
+            value += (h - lo) * (order[lo + 1] - value)
+        result.append(value)
+    return result
+
+
+def percentile_label(p):
+    """
+    Short name of a percentile, e.g. p50 or p99.9
+    """
+    return "p%g" % p
+
+
+def parse_percentiles(text):
+    """
+    Turn "50,90,99.9" into a list of percentiles, checking each is in [0, 100]
+    """
+    percentiles = [float(p) for p in text.split(",") if p.strip()]
+    for p in percentiles:
+        if not 0 <= p <= 100:
+            raise ValueError("percentile %g is not between 0 and 100" % p)
+    return percentiles
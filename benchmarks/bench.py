@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark harness for bashplotlib ingestion, binning and rendering
+
+    python benchmarks/bench.py                          # default sizes
+    python benchmarks/bench.py --sizes 1e3,1e5,1e8      # up to 100M values
+    python benchmarks/bench.py --save baseline.json
+    python benchmarks/bench.py --compare baseline.json  # exit 1 on regression
+
+Synthetic inputs (uniform, exponential and heavy-tailed pareto) are
+written to a temporary directory once per size. Every case runs in its
+own process so the recorded peak RSS belongs to that case alone; the
+best of --repeat runs is kept. Results record seconds, values per second,
+peak RSS and the number of bytes of chart output.
+"""
+
+from __future__ import print_function
+
+import json
+import multiprocessing
+import optparse
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bashplotlib.histogram import calc_bins, read_numbers, render_hist
+from bashplotlib.horizontal_histogram import get_y_label, render_horiz_hist
+from bashplotlib.scatterplot import build_scatter
+from bashplotlib.utils.binning import bin_numbers
+from bashplotlib.utils.readers import iter_number_chunks
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DISTRIBUTIONS = {
+    "uniform": lambda rng: rng.uniform(0, 1000),
+    "exponential": lambda rng: rng.expovariate(0.01),
+    "pareto": lambda rng: rng.paretovariate(1.2),
+}
+
+
+def write_input(path, dist, n, seed=0):
+    rng = random.Random(seed)
+    draw = DISTRIBUTIONS[dist]
+    with open(path, 'w') as fh:
+        remaining = n
+        while remaining:
+            batch = min(remaining, 100000)
+            fh.write("\n".join("%.6f" % draw(rng) for _ in range(batch)) + "\n")
+            remaining -= batch
+
+
+def load(path):
+    numbers = array('d')
+    for chunk in iter_number_chunks(path):
+        numbers.extend(chunk)
+    return numbers
+
+
+def case_read_numbers(path):
+    for _ in read_numbers(path):
+        pass
+    return 0
+
+
+def case_calc_bins(path, numbers):
+    list(calc_bins(len(numbers), min(numbers), max(numbers), 200))
+    return 0
+
+
+def case_binning(path, numbers, bins, max_val):
+    bin_numbers(numbers, bins, max_val)
+    return 0
+
+
+def case_build_scatter(path, numbers):
+    half = len(numbers) // 2
+    return len(build_scatter(numbers[:half], numbers[half:2 * half], 20, "x", "default", "", None, None, None))
+
+
+def case_get_y_label(path, numbers):
+    ys = [int(x) + 1 for x in numbers[:10000]]
+    return len(get_y_label(ys, 4))
+
+
+def case_render_hist(path):
+    return len(render_hist(path, xlab=True, showSummary=True))
+
+
+def case_render_horiz_hist(path):
+    return len(render_horiz_hist(path, xlab=True, showSummary=True))
+
+
+# name -> (function, needs the values in memory)
+CASES = [
+    ("read_numbers", case_read_numbers, False),
+    ("calc_bins", case_calc_bins, True),
+    ("binning", case_binning, True),
+    ("build_scatter", case_build_scatter, True),
+    ("get_y_label", case_get_y_label, True),
+    ("render_hist", case_render_hist, False),
+    ("render_horiz_hist", case_render_horiz_hist, False),
+]
+
+
+def run_case(func, needs_values, path, conn):
+    """
+    Time a single case in a child process and send back its measurements
+    """
+    args = [path]
+    if needs_values:
+        numbers = load(path)
+        args.append(numbers)
+        if func is case_binning:
+            args.extend([list(calc_bins(len(numbers), min(numbers), max(numbers), 200)), max(numbers)])
+    start = time.time()
+    output_bytes = func(*args)
+    seconds = time.time() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    if sys.platform == "darwin" and peak_rss:
+        peak_rss //= 1024
+    conn.send((seconds, peak_rss, output_bytes))
+    conn.close()
+
+
+def measure(func, needs_values, path, repeat):
+    best = None
+    for _ in range(repeat):
+        parent, child = multiprocessing.Pipe(duplex=False)
+        proc = multiprocessing.Process(target=run_case, args=(func, needs_values, path, child))
+        proc.start()
+        result = parent.recv()
+        proc.join()
+        if best is None or result[0] < best[0]:
+            best = result
+    return best
+
+
+def run(sizes, dists, cases, repeat):
+    results = {}
+    tmpdir = tempfile.mkdtemp(prefix="bashplotlib-bench-")
+    try:
+        for size in sizes:
+            for dist in dists:
+                path = os.path.join(tmpdir, "%s-%d.txt" % (dist, size))
+                write_input(path, dist, size)
+                for name, func, needs_values in CASES:
+                    if cases and name not in cases:
+                        continue
+                    seconds, peak_rss, output_bytes = measure(func, needs_values, path, repeat)
+                    key = "%s/%s/%d" % (name, dist, size)
+                    results[key] = {
+                        "seconds": seconds,
+                        "throughput": size / seconds if seconds else None,
+                        "peak_rss_kb": peak_rss,
+                        "output_bytes": output_bytes,
+                    }
+                    print("%-36s %10.4fs %14.0f/s %10s KB %8d B" % (
+                        key, seconds, results[key]["throughput"] or 0, peak_rss, output_bytes))
+                os.remove(path)
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print throughput relative to a baseline, returning the regressed keys
+    """
+    regressions = []
+    print()
+    print("%-36s %14s %14s %8s" % ("case", "baseline/s", "current/s", "ratio"))
+    for key in sorted(results):
+        if key not in baseline or not baseline[key]["throughput"]:
+            continue
+        old, new = baseline[key]["throughput"], results[key]["throughput"] or 0
+        ratio = new / old
+        flag = ""
+        if ratio * threshold < 1:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print("%-36s %14.0f %14.0f %7.2fx%s" % (key, old, new, ratio, flag))
+    return regressions
+
+
+def main():
+    parser = optparse.OptionParser(usage=__doc__)
+    parser.add_option('--sizes', default='1e3,1e4,1e5,1e6', help='comma separated input sizes')
+    parser.add_option('--dists', default=','.join(sorted(DISTRIBUTIONS)), help='comma separated distributions')
+    parser.add_option('--cases', default='', help='comma separated cases to run (default all)')
+    parser.add_option('--repeat', type='int', default=3, help='runs per case, the best is kept')
+    parser.add_option('--save', default=None, help='write the results to this JSON file')
+    parser.add_option('--compare', default=None, help='compare against a saved JSON baseline')
+    parser.add_option('--threshold', type='float', default=1.2,
+                      help='slowdown factor that counts as a regression')
+    opts, args = parser.parse_args()
+
+    sizes = [int(float(size)) for size in opts.sizes.split(',')]
+    dists = opts.dists.split(',')
+    cases = [case for case in opts.cases.split(',') if case]
+    results = run(sizes, dists, cases, opts.repeat)
+
+    if opts.save:
+        with open(opts.save, 'w') as fh:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, fh, indent=2, sort_keys=True)
+
+    if opts.compare:
+        with open(opts.compare) as fh:
+            baseline = json.load(fh)["results"]
+        if compare(results, baseline, opts.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
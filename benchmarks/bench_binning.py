@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark histogram binning throughput as the number of bins grows
+
+    python benchmarks/bench_binning.py [n_values]
+
+Compares the original linear bin scan with bin_numbers (arithmetic
+lookup for uniform edges, bisect otherwise) and checks they agree.
+"""
+
+from __future__ import print_function
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bashplotlib.histogram import calc_bins
+from bashplotlib.utils.binning import bin_numbers
+
+
+def linear_scan(numbers, bins, max_val):
+    hist = [0] * len(bins)
+    for number in numbers:
+        for i, b in enumerate(bins):
+            if number <= b:
+                hist[i] += 1
+                break
+        if number == max_val and max_val > bins[len(bins) - 1]:
+            hist[len(hist) - 1] += 1
+    return hist
+
+
+def best_of(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(0)
+    numbers = [rng.expovariate(0.1) for _ in range(n)]
+    min_val, max_val = min(numbers), max(numbers)
+
+    print("%d values" % n)
+    print("%8s %12s %12s %12s %8s" % ("bins", "linear/s", "even/s", "uneven/s", "speedup"))
+    for bincount in (10, 50, 200, 1000, 5000):
+        bins = list(calc_bins(n, min_val, max_val, bincount))
+        # jitter one interior edge so the bisect fallback is exercised too
+        uneven = bins[:]
+        uneven[1] = (uneven[0] + uneven[1]) / 2.0
+
+        expected = linear_scan(numbers, bins, max_val)
+        assert bin_numbers(numbers, bins, max_val) == expected
+        assert bin_numbers(numbers, uneven, max_val) == linear_scan(numbers, uneven, max_val)
+
+        t_linear = best_of(lambda: linear_scan(numbers, bins, max_val), repeat=1)
+        t_uniform = best_of(lambda: bin_numbers(numbers, bins, max_val))
+        t_bisect = best_of(lambda: bin_numbers(numbers, uneven, max_val))
+        print("%8d %12.0f %12.0f %12.0f %7.1fx" % (
+            len(bins), n / t_linear, n / t_uniform, n / t_bisect, t_linear / t_uniform))
+
+
+if __name__ == "__main__":
+    main()
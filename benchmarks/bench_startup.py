@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark command line startup time of the bashplotlib commands
+
+    python benchmarks/bench_startup.py [--runs 20] [--target 50]
+
+Each command is run as a fresh process on a tiny input, the way a shell
+pipeline calls it, and the wall time is recorded. A bare interpreter is
+timed too so the cost of bashplotlib itself can be read off, and so is
+`bashplotlib client hist` against a server started for the benchmark.
+Exits with status 1 when the median of any command is over --target
+milliseconds.
+
+Byte code is compiled first, as it would be for an installed package.
+"""
+
+from __future__ import print_function
+
+import compileall
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# what the `bashplotlib` console script runs
+ENTRY = "import sys; from bashplotlib.cli import main; sys.exit(main())"
+
+# seconds to wait for the benchmark server to start listening
+SERVER_TIMEOUT = 10
+
+
+def time_command(args, stdin_path, runs, env):
+    times = []
+    for _ in range(runs):
+        with open(stdin_path, 'rb') as stdin:
+            start = time.time()
+            subprocess.check_call(args, stdin=stdin, stdout=subprocess.DEVNULL, env=env)
+            times.append((time.time() - start) * 1000)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def main():
+    parser = optparse.OptionParser(usage=__doc__)
+    parser.add_option('--runs', type='int', default=20, help='runs per command')
+    parser.add_option('--target', type='float', default=50.0,
+                      help='median startup budget per command in milliseconds')
+    opts, args = parser.parse_args()
+
+    compileall.compile_dir(os.path.join(ROOT, "bashplotlib"), quiet=1)
+
+    fd, numbers = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, 'w') as fh:
+        fh.write("\n".join(str(i % 17) for i in range(200)) + "\n")
+    fd, points = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, 'w') as fh:
+        fh.write("\n".join("%d,%d" % (i, i * i % 31) for i in range(200)) + "\n")
+
+    python = [sys.executable]
+    commands = [
+        ("python (no-op)", python + ["-c", "pass"], numbers),
+        ("bashplotlib hist", python + ["-c", ENTRY, "hist"], numbers),
+        ("bashplotlib hbar", python + ["-c", ENTRY, "hbar"], numbers),
+        ("bashplotlib scatter", python + ["-c", ENTRY, "scatter"], points),
+        ("bashplotlib client hist", python + ["-c", ENTRY, "client", "hist"], numbers),
+    ]
+
+    sock = os.path.join(tempfile.mkdtemp(prefix="bashplotlib-bench-"), "server.sock")
+    env = dict(os.environ, PYTHONPATH=ROOT, BASHPLOTLIB_SOCKET=sock)
+    server = subprocess.Popen(python + ["-m", "bashplotlib", "serve"], env=env, stderr=subprocess.DEVNULL)
+
+    over = []
+    try:
+        deadline = time.time() + SERVER_TIMEOUT
+        while not os.path.exists(sock):
+            if server.poll() is not None:
+                sys.exit("bashplotlib serve exited with status %d before listening" % server.returncode)
+            if time.time() > deadline:
+                sys.exit("bashplotlib serve was not listening after %d seconds" % SERVER_TIMEOUT)
+            time.sleep(0.01)
+
+        print("%-24s %10s %10s" % ("command", "min ms", "median ms"))
+        for name, args, stdin_path in commands:
+            best, median = time_command(args, stdin_path, opts.runs, env)
+            flag = ""
+            if name.startswith("bashplotlib") and median > opts.target:
+                over.append(name)
+                flag = "  over %.0f ms" % opts.target
+            print("%-24s %10.1f %10.1f%s" % (name, best, median, flag))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(os.path.dirname(sock))
+        os.remove(numbers)
+        os.remove(points)
+
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
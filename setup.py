@@ -17,8 +17,11 @@ setup(
     long_description=long_description,
     entry_points = {
         'console_scripts': [
+            'bashplotlib=bashplotlib.cli:main',
             'hist=bashplotlib.histogram:main',
+            'hbar=bashplotlib.horizontal_histogram:main',
             'scatter=bashplotlib.scatterplot:main',
+            'heatmap=bashplotlib.heatmap:main',
         ]
     },
     keywords=['plotting', 'console', 'shell'],
@@ -1,6 +1,34 @@
 # test.py
-from bashplotlib.scatterplot import build_scatter
+from bashplotlib.scatterplot import (build_scatter, format_scatter_data, read_columns, render_scatter, sample_columns,
+                                     scatter_data, xy_chunks)
+from bashplotlib.histogram import (calc_bins, follow_hist, format_hist_data, hist_data, histogram_counts,
+                                   histogram_counts_files, input_percentiles, iter_lines, read_numbers, render_hist,
+                                   series_histogram_counts)
+from bashplotlib.heatmap import parse_time, render_heatmap
+from bashplotlib.horizontal_histogram import bucket_edges, bucket_sums, get_y_label, render_horiz_hist
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from bashplotlib import aio, cli, client, heatmap, histogram, horizontal_histogram, scatterplot, server
+from bashplotlib.utils.backend import get_numpy, load_columns, load_numbers
+from bashplotlib.utils.binning import AdaptiveGrid, AdaptiveHistogram, bin_numbers
+from bashplotlib.utils.cache import RenderCache
+from bashplotlib.utils.helpers import density_char, drange
+from bashplotlib.utils.readers import iter_column_chunks, iter_number_chunks
+from bashplotlib.utils.sampling import Reservoir
+from bashplotlib.utils.sketch import DDSketch
+from bashplotlib.utils.stats import RunningStats, quantiles, select
+import asyncio
+import contextlib
+import csv
 import difflib
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import statistics
+import struct
 import unittest
     
 class SimpleTestCase(unittest.TestCase):
@@ -174,5 +202,641 @@ y: Best Axis
         assert expected_result == result
         
 
+class ScatterTestCase(unittest.TestCase):
+    def testPointColours(self):
+        result = build_scatter([1, 2, 3], [1, 2, 3], 2, 'x', 'default', '', ['red', 'default', 'blue'], None, None)
+        self.assertEqual(result.count('\033[91mx\033[39m'), 1)
+        self.assertEqual(result.count('\033[94mx\033[39m'), 1)
+        self.assertEqual(result.count('x'), 3)
+
+    def testDensity(self):
+        rows = ["1,1"] * 50 + ["2,2"] * 5 + ["3,3"]
+        points = render_scatter(rows, None, None, 2, 'x', 'default', '')
+        density = render_scatter(rows, None, None, 2, 'x', 'default', '', density=True)
+        self.assertEqual(density, render_scatter(iter(rows), None, None, 2, 'x', 'default', '', density=True))
+        self.assertEqual(points.replace('x', ' '), density.replace('@', ' ').replace('=', ' ').replace('.', ' '))
+        self.assertEqual([density.count(c) for c in '@=.'], [1, 1, 1])
+        chunks = xy_chunks(iter(rows))
+        first = [(list(xs), list(ys)) for xs, ys in chunks()]
+        self.assertEqual(first, [(list(xs), list(ys)) for xs, ys in chunks()])
+        self.assertEqual(first[0][0][:2], [1.0, 1.0])
+        self.assertEqual(density_char(0, 10), ' ')
+        self.assertEqual(density_char(10, 10), '@')
+
+    def testEmptyInput(self):
+        for argv in ([], ["--density"], ["--format", "json"], ["--sample", "5"], ["--backend", "numpy"]):
+            out = io.StringIO()
+            scatterplot.run(argv, stdin=io.StringIO(""), out=out)
+            self.assertEqual(out.getvalue(), "nothing to plot!\n")
+
+    def testColumnSelection(self):
+        rows = ["t,latency,host\n", "1,5,a\n", "2,7,b\n", "\n", "3,-2,a\n"]
+        xs, ys, cs, bounds = read_columns(rows, "t", "latency")
+        self.assertEqual((list(xs), list(ys), cs), ([1, 2, 3], [5, 7, -2], None))
+        self.assertEqual(bounds, (1, 3, -2, 7))
+        self.assertEqual(list(read_columns(rows, 1, 0)[0]), [5, 7, -2])
+        self.assertEqual(render_scatter(rows, None, None, 5, 'x', 'default', '', xcol="t", ycol="latency"),
+                         build_scatter([1, 2, 3], [5, 7, -2], 5, 'x', 'default', '', None, None, None))
+        self.assertRaises(ValueError, read_columns, rows, "t", "missing")
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, 'w') as fh:
+            fh.writelines(rows)
+        try:
+            self.assertEqual(read_columns(path, "t", "latency"), (xs, ys, cs, bounds))
+        finally:
+            os.remove(path)
+
+
+class HistogramTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(42)
+        self.numbers = [rng.expovariate(0.5) for _ in range(1000)]
+
+    def testRunningStats(self):
+        stats = RunningStats().extend(self.numbers)
+        self.assertEqual(stats.n, len(self.numbers))
+        self.assertEqual(stats.min_val, min(self.numbers))
+        self.assertEqual(stats.max_val, max(self.numbers))
+        self.assertAlmostEqual(stats.mean, statistics.mean(self.numbers))
+        self.assertAlmostEqual(stats.sd, statistics.stdev(self.numbers))
+
+        merged = RunningStats().extend(self.numbers[:300])
+        merged.merge(RunningStats().extend(self.numbers[300:]))
+        self.assertEqual(merged.n, stats.n)
+        self.assertAlmostEqual(merged.mean, stats.mean)
+        self.assertAlmostEqual(merged.sd, stats.sd)
+
+    def testGeneratorInput(self):
+        bins, hist, stats = histogram_counts(self.numbers)
+        gen_bins, gen_hist, gen_stats = histogram_counts(x for x in self.numbers)
+        self.assertEqual(bins, gen_bins)
+        self.assertEqual(hist, gen_hist)
+        self.assertEqual(sum(hist), len(self.numbers))
+        self.assertEqual(stats.n, gen_stats.n)
+        # numbers in memory are counted as they are, lines of text parsed
+        lines = ["%r\n" % x for x in self.numbers]
+        for f in (array('d', self.numbers), tuple(self.numbers), lines, [int(x) for x in self.numbers]):
+            self.assertEqual(histogram_counts(f, bincount=8)[1], histogram_counts(iter(f), bincount=8)[1])
+        self.assertEqual(histogram_counts(lines)[:2], (bins, hist))
+
+    def testDrange(self):
+        self.assertEqual(drange(0, 1, 0.1, include_stop=True)[-1], 1.0)
+        self.assertEqual(len(drange(0, 1, 0.1, include_stop=True)), 11)
+        self.assertEqual(len(drange(0, 1, 0.1)), 10)
+        tiny = drange(0, 1e-12, 1e-13, include_stop=True)
+        self.assertEqual(len(tiny), 11)
+        self.assertAlmostEqual(tiny[5], 5e-13, places=20)
+        huge = drange(1e15, 2e15, 1e14, include_stop=True)
+        self.assertEqual(huge[-1], 2e15)
+        values = drange(0.01, 22.36, (22.36 - 0.01) / 40, include_stop=True)
+        self.assertEqual(len(values), 41)
+        self.assertEqual(values[0], 0.01)
+        self.assertEqual(values[-1], 22.36)
+        self.assertIs(drange(0, 5, 0.5), drange(0, 5, 0.5))
+
+    def testBinNumbers(self):
+        def linear_scan(numbers, bins, max_val):
+            hist = [0] * len(bins)
+            for number in numbers:
+                for i, b in enumerate(bins):
+                    if number <= b:
+                        hist[i] += 1
+                        break
+                if number == max_val and max_val > bins[-1]:
+                    hist[-1] += 1
+            return hist
+
+        min_val, max_val = min(self.numbers), max(self.numbers)
+        for bincount, binwidth in [(None, None), (500, None), (None, 0.7), (None, 0.01)]:
+            bins = list(calc_bins(len(self.numbers), min_val, max_val, bincount, binwidth))
+            self.assertEqual(bin_numbers(self.numbers, bins, max_val),
+                             linear_scan(self.numbers, bins, max_val))
+        uneven = [0, 0.5, 2, 3, 7, 12]
+        self.assertEqual(bin_numbers(self.numbers, uneven, max_val),
+                         linear_scan(self.numbers, uneven, max_val))
+
+        # nan and inf are left out alike by the bisect and arithmetic lookups
+        odd = self.numbers + [float("nan"), float("inf"), float("-inf")]
+        for bincount in (10, 500):
+            bins = list(calc_bins(len(self.numbers), min_val, max_val, bincount))
+            self.assertEqual(bin_numbers(odd, bins, max_val), linear_scan(self.numbers, bins, max_val))
+
+    @unittest.skipUnless(get_numpy(), "numpy is not installed")
+    def testNumpyBackend(self):
+        for bincount, binwidth in [(None, None), (300, None), (None, 0.7)]:
+            bins, hist, stats = histogram_counts(self.numbers, bincount, binwidth)
+            np_bins, np_hist, np_stats = histogram_counts(self.numbers, bincount, binwidth, backend="numpy")
+            self.assertEqual(bins, np_bins)
+            self.assertEqual(hist, np_hist)
+            self.assertEqual(stats.n, np_stats.n)
+            self.assertAlmostEqual(stats.sd, np_stats.sd)
+
+        self.assertEqual(load_numbers(io.BytesIO(b"1 2.5\r\n-3\n")).tolist(), [1, 2.5, -3])
+        self.assertEqual(load_numbers(io.StringIO(" \n")).size, 0)
+        self.assertRaises(ValueError, load_numbers, io.StringIO("1 x 2"))
+        self.assertEqual(load_columns(["1, 2\n", "\n", "3,4\n"]).tolist(), [[1, 2], [3, 4]])
+        for rows in ([], ["x,y\n", "1,2\n"], ["1,2,red\n"], ["1,2,3\n"], ["1,2\n", "3\n"]):
+            self.assertIsNone(load_columns(rows))
+
+    def testAdaptiveHistogram(self):
+        hist = AdaptiveHistogram(bincount=15, warmup=10)
+        for number in self.numbers + [-50, 400]:
+            hist.add(number)
+        bins = hist.bins()
+        self.assertEqual(len(bins), 16)
+        self.assertEqual(sum(hist.counts), len(self.numbers) + 2)
+        self.assertTrue(hist.lo <= -50 and hist.hi >= 400)
+        self.assertEqual(bins[-1], hist.hi)
+
+    def testFollow(self):
+        lines = "1\nnan\n2\ninf\nfoo\n-inf\n\n3\n1e400\n"
+        out = io.StringIO()
+        follow_hist(io.StringIO(lines), bincount=4, showSummary=True, refresh=0, out=out)
+        self.assertIn("observations: 3", out.getvalue())
+        self.assertIn("max value: 3.000000", out.getvalue())
+
+        # a followed file is polled for lines appended after its end
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.write(fd, b"1\n2\n")
+        try:
+            with open(path, 'rb') as stream:
+                lines = iter_lines(stream, 0.01, tail=True)
+                self.assertEqual(next(lines), [b"1", b"2"])
+                self.assertEqual(next(lines), [])
+                os.write(fd, b"3\n")
+                self.assertEqual(next(lines), [b"3"])
+        finally:
+            os.close(fd)
+            os.remove(path)
+        for argv in (["--sketch"], ["--percentiles", "50"], ["--backend", "numpy"], ["-w", "2"]):
+            err = io.StringIO()
+            self.assertRaises(SystemExit, histogram.parse_args, ["--follow"] + argv, err=err)
+            self.assertIn("--follow draws a single text input", err.getvalue())
+
+    def testHorizontalLabels(self):
+        self.assertEqual(get_y_label([1, 5, 5.5, 10, 105], 2).split("\n"),
+                         ["    15 11", "       00", "        5"])
+        hist = [3, 1, 4, 1, 5, 9, 2, 6]
+        self.assertEqual(bucket_sums(hist, [-1, 0.5, 2, 2.5, 6, 40]), [0, 3, 5, 0, 17, 6])
+
+    def testBucketSumsMatchBaseline(self):
+        def baseline(hist, xs):
+            # the nested loop format_horiz_hist used before bucket_sums
+            sums, index = [], 0
+            for x in xs:
+                bin_sum = 0
+                for i in range(len(hist)):
+                    if i >= index and i <= x:
+                        bin_sum += hist[i]
+                        index = i + 1
+                sums.append(bin_sum)
+            return sums
+
+        rng = random.Random(7)
+        for _ in range(200):
+            hist = [rng.randrange(10) for _ in range(rng.randrange(1, 30))]
+            xs = sorted(rng.uniform(-2, 35) for _ in range(rng.randrange(1, 12)))
+            expected = baseline(hist, xs)
+            # ... except that bins past the last edge now land in the last row
+            expected[-1] += sum(hist) - sum(expected)
+            self.assertEqual(bucket_sums(hist, xs), expected)
+
+    def testHorizontalTotals(self):
+        for data, bincount, binwidth in [(list(range(1, 101)), 10, 1), (self.numbers, None, None),
+                                         ([x * 3 for x in range(40)], 7, None), ([5] * 20, None, None)]:
+            bins, hist, stats = histogram_counts(data, bincount, binwidth)
+            xs = bucket_edges(stats.min_val, stats.max_val)
+            self.assertEqual(xs[-1], stats.max_val + 1)
+            self.assertEqual(sum(bucket_sums(hist, xs)), len(data))
+
+    def testEmptyInput(self):
+        self.assertRaises(ValueError, render_hist, [])
+        self.assertRaises(ValueError, histogram_counts, iter(["", "\n"]), backend="numpy")
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        os.close(fd)
+        try:
+            for module, argv in [(histogram, []), (histogram, ["--sketch"]), (histogram, ["--format", "json"]),
+                                 (histogram, ["-f", path]), (histogram, ["-f", path, "-f", path]),
+                                 (horizontal_histogram, []), (horizontal_histogram, ["-f", path])]:
+                out = io.StringIO()
+                module.run(argv, stdin=io.StringIO(""), out=out)
+                self.assertEqual(out.getvalue(), "nothing to plot!\n")
+        finally:
+            os.remove(path)
+
+    def testSampling(self):
+        reservoir = Reservoir(50, seed=1, columns=2)
+        for start in range(0, 1000, 64):
+            block = list(range(start, min(start + 64, 1000)))
+            reservoir.extend(block, [-x for x in block])
+        xs, ys = reservoir.columns
+        self.assertEqual(len(xs), 50)
+        self.assertEqual(len(set(xs)), 50)
+        self.assertEqual(ys, [-x for x in xs])
+        self.assertTrue(max(xs) >= 500)
+
+        exact = histogram_counts(self.numbers, bincount=10)
+        bins, hist, stats = histogram_counts(iter(self.numbers), bincount=10, sample=200, seed=3)
+        self.assertEqual(bins, exact[0])
+        self.assertEqual((stats.n, stats.min_val, stats.max_val), (1000, min(self.numbers), max(self.numbers)))
+        self.assertAlmostEqual(sum(hist), 1000, delta=10)
+        self.assertEqual(histogram_counts(self.numbers, bincount=10, sample=200, seed=3)[1], hist)
+        self.assertEqual(histogram_counts(self.numbers, bincount=10, sample=5000)[1], exact[1])
+
+        points = ["%r,%r" % (x, x * x) for x in self.numbers]
+        xs, ys, cs, bounds = sample_columns(points, sample=30, seed=2)
+        self.assertEqual(len(xs), 30)
+        self.assertEqual(bounds[:2], (min(self.numbers), max(self.numbers)))
+        self.assertEqual(render_scatter(points, None, None, 10, "x", "default", "", sample=30, seed=2),
+                         build_scatter(xs, ys, 10, "x", "default", "", None, None, None, bounds))
+
+        # only seeded samples are cached, an unseeded one is drawn afresh every time
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, 'w') as fh:
+            fh.write("\n".join(map(repr, self.numbers)))
+        try:
+            cache = RenderCache()
+            render_hist(path, bincount=10, sample=200, cache=cache)
+            render_scatter(None, path, path, 10, "x", "default", "", sample=30, cache=cache)
+            scatter_data(None, path, path, 10, sample=30, cache=cache)
+            self.assertEqual((cache.hits, cache.misses, len(cache.entries)), (0, 0, 0))
+            render_hist(path, bincount=10, sample=200, seed=1, cache=cache)
+            render_hist(path, bincount=10, sample=200, seed=1, cache=cache)
+            self.assertEqual(cache.hits, 1)
+        finally:
+            os.remove(path)
+
+    def testPercentiles(self):
+        ordered = sorted(self.numbers)
+        self.assertEqual(select(self.numbers, [0, 500, 999, 500]), [ordered[0], ordered[500], ordered[999], ordered[500]])
+        self.assertEqual(quantiles([1, 2, 3, 4], [0, 0.5, 1, 0.25]), [1, 2.5, 4, 1.75])
+        expected = statistics.quantiles(self.numbers, n=100, method='inclusive')
+        p50, p99 = quantiles(self.numbers, [0.5, 0.99])
+        self.assertAlmostEqual(p50, expected[49])
+        self.assertAlmostEqual(p99, expected[98])
+
+        bins, hist, stats = histogram_counts(iter(self.numbers), bincount=10, percentiles=[50, 99])
+        self.assertEqual(stats.percentiles, [(50, p50), (99, p99)])
+        self.assertEqual((bins, hist), histogram_counts(self.numbers, bincount=10)[:2])
+        self.assertEqual(input_percentiles(self.numbers, [50, 99]), stats.percentiles)
+        for p, value in input_percentiles(self.numbers, [50, 99], accuracy=0.01):
+            exact = dict(stats.percentiles)[p]
+            self.assertAlmostEqual(value, exact, delta=0.011 * abs(exact))
+
+        text = render_hist(self.numbers, bincount=10, showSummary=True, percentiles=[50, 99.9])
+        self.assertIn("p50: %f" % p50, text)
+        self.assertIn("p99.9: ", text)
+        self.assertNotIn("p50", render_hist(self.numbers, bincount=10, showSummary=True))
+
+    def testSeries(self):
+        a, b = self.numbers[:600], [x + 3 for x in self.numbers[600:]]
+        bins, series, stats = series_histogram_counts({"a": a, "b": b}, bincount=12)
+        self.assertEqual(bins, list(calc_bins(1000, min(a + b), max(a + b), 12)))
+        self.assertEqual([name for name, _, _ in series], ["a", "b"])
+        self.assertEqual(series[0][1], bin_numbers(a, bins, max(a + b)))
+        self.assertEqual(sum(series[1][1]), 400)
+        self.assertEqual(stats.n, 1000)
+        self.assertAlmostEqual(stats.mean, statistics.mean(a + b))
+
+        rows = ["name,value"] + ["a,%r" % x for x in a] + ["b,%r" % x for x in b]
+        for layout in ("overlay", "multiples"):
+            text = render_hist(rows, bincount=12, showSummary=True, groupcol="name", layout=layout)
+            self.assertEqual(text, render_hist({"a": a, "b": b}, bincount=12, showSummary=True, layout=layout))
+            self.assertIn("o a", text)
+            self.assertIn("x b", text)
+        self.assertRaises(ValueError, render_hist, rows, groupcol="size")
+
+
+class HeatmapTestCase(unittest.TestCase):
+    def testAdaptiveGrid(self):
+        rng = random.Random(7)
+        grid = AdaptiveGrid(cols=10, rows=6, warmup=50)
+        points = [(t, rng.gauss(100 if t < 500 else 200, 10)) for t in range(1000)]
+        for start in range(0, len(points), 64):
+            block = points[start:start + 64]
+            grid.extend([t for t, _ in block], [v for _, v in block])
+        self.assertEqual(len(grid.counts), 10)
+        self.assertEqual(sum(map(sum, grid.counts)), 1000)
+        self.assertTrue(grid.x_lo <= 0 and grid.x_hi >= 999)
+        self.assertEqual(grid.bounds[:2], (0, 999))
+        (c0, c1), (r0, r1) = grid.span()
+        self.assertEqual(sum(sum(column[r0:r1 + 1]) for column in grid.counts[c0:c1 + 1]), 1000)
+
+    def testRenderHeatmap(self):
+        self.assertEqual(parse_time("2024-05-01T12:00:00Z"), 1714564800)
+        self.assertEqual(parse_time("2024-05-01T14:00:00+02:00"), 1714564800)
+        rows = ["time,ms"] + ["2024-05-01T12:%02d:00,%d" % (i % 60, 10 + i % 7) for i in range(600)]
+        text = render_heatmap(rows, width=20, height=5, showSummary=True, valuecol="ms")
+        self.assertIn("12:00:00", text)
+        self.assertIn("12:59:00", text)
+        self.assertIn("observations: 600", text)
+        numeric = ["%d,%d" % (1714564800 + i % 60 * 60, 10 + i % 7) for i in range(600)]
+        self.assertEqual(render_heatmap(numeric, width=20, height=5, showSummary=True), text)
+        self.assertRaises(ValueError, render_heatmap, [], 20, 5)
+        odd = numeric + ["1714564800,nan", "inf,12", "1714564860,-inf"]
+        self.assertEqual(render_heatmap(odd, width=20, height=5, showSummary=True), text)
+        for stdin in ("", "time,ms\n", "1,nan\n"):
+            out = io.StringIO()
+            heatmap.run([], stdin=io.StringIO(stdin), out=out)
+            self.assertEqual(out.getvalue(), "nothing to plot!\n")
+
+
+class SketchTestCase(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.numbers = [rng.lognormvariate(0, 2) - 1 for _ in range(5000)]
+
+    def testQuantiles(self):
+        sketch = DDSketch(0.01).extend(self.numbers)
+        ordered = sorted(self.numbers)
+        for q in (0.1, 0.5, 0.9, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), 0.0101 * abs(exact))
+
+    def testMergeAndSerialise(self):
+        whole = DDSketch().extend(self.numbers)
+        left = DDSketch().extend(self.numbers[:1234])
+        right = DDSketch.loads(DDSketch().extend(self.numbers[1234:]).dumps())
+        merged = left.merge(right)
+        self.assertEqual(merged.positive, whole.positive)
+        self.assertEqual(merged.negative, whole.negative)
+        self.assertEqual(merged.count, len(self.numbers))
+        self.assertAlmostEqual(merged.stats.sd, whole.stats.sd)
+
+    def testFixedMemory(self):
+        sketch = DDSketch(0.001, max_buckets=100).extend(self.numbers)
+        self.assertLessEqual(len(sketch.positive) + len(sketch.negative), 100)
+        self.assertEqual(sum(sketch.histogram([-1, 0, 1, 10, 1e6])), len(self.numbers))
+
+    def testSketchHistogram(self):
+        bins, hist, stats = histogram_counts(self.numbers, sketch=True)
+        exact_bins, exact_hist, exact_stats = histogram_counts(self.numbers)
+        self.assertEqual(bins, exact_bins)
+        self.assertAlmostEqual(sum(hist), sum(exact_hist), delta=len(self.numbers) * 0.01)
+        self.assertEqual(stats.max_val, max(self.numbers))
+
+
+class RenderTestCase(unittest.TestCase):
+    def testRenderToString(self):
+        numbers = list(range(1, 50)) * 3
+        text = render_hist(numbers, showSummary=True, title="T")
+        self.assertIn("observations: 147", text)
+        out = io.StringIO()
+        self.assertEqual(render_horiz_hist(numbers, xlab=True, out=out), out.getvalue())
+        plot = render_scatter(None, [1, 2, 3], [3, 1, 2], 5, 'x', 'default', '')
+        self.assertEqual(plot.count('x'), 3)
+
+    def testConcurrentRendering(self):
+        inputs = [[i * j % 37 for i in range(200)] for j in range(1, 17)]
+        expected = [render_hist(numbers, xlab=True) for numbers in inputs]
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(lambda numbers: render_hist(numbers, xlab=True), inputs)), expected)
+
+    def testAsyncRendering(self):
+        numbers = [i * 7 % 23 for i in range(500)]
+        text = "\n".join(str(x) for x in numbers)
+
+        async def chunks(size):
+            for i in range(0, len(text), size):
+                yield text[i:i + size].encode()
+
+        async def pairs():
+            for x, y in zip(numbers, numbers[1:]):
+                yield x, y
+
+        async def render_all():
+            return await asyncio.gather(
+                aio.render_hist_async(chunks(5), bincount=12, showSummary=True),
+                aio.render_hist_async(numbers, bincount=12, showSummary=True),
+                aio.render_scatter_async(pairs(), None, None, 10, 'x', 'default', ''))
+
+        from_chunks, from_list, scatter = asyncio.run(render_all())
+
+        values = [i * 0.37 for i in range(40000)]
+        big = " ".join(map(repr, values)) + "\n"
+
+        async def big_chunks():
+            # chunks longer than PARSE_INLINE, split in the middle of a number
+            cut = len(big) // 2 + 3
+            yield big[:cut]
+            yield big[cut:].encode()
+        self.assertEqual(list(asyncio.run(aio.collect_numbers(big_chunks()))), values)
+        self.assertEqual(from_chunks, render_hist(numbers, bincount=12, showSummary=True))
+        self.assertEqual(from_list, from_chunks)
+        self.assertEqual(scatter, build_scatter(numbers[:-1], numbers[1:], 10, 'x', 'default', '', None, None, None))
+
+    def testCommandDispatch(self):
+        fd, path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, 'w') as fh:
+            fh.write("\n".join(str(i % 7) for i in range(100)))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                cli.main(["hist", "-f", path, "-b", "7"])
+            self.assertEqual(out.getvalue(), render_hist(path, height=None, bincount=7, showSummary=True))
+        finally:
+            os.remove(path)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(cli.main(["--help"]), 0)
+            self.assertEqual(cli.main(["pie"]), 2)
+
+    def testDataOutput(self):
+        numbers = [i * 7 % 23 for i in range(500)]
+        bins, hist, stats = histogram_counts(numbers, bincount=12, percentiles=[50])
+        data = hist_data(numbers, bincount=12, percentiles=[50])
+        self.assertEqual((data["bins"], data["counts"]), (bins, hist))
+        self.assertEqual(data["summary"]["observations"], 500)
+        self.assertEqual(data["summary"]["p50"], dict(stats.percentiles)[50])
+        out = io.StringIO()
+        histogram.run(["-b", "12", "--percentiles", "50", "--format", "json"], stdin=io.StringIO(
+            "\n".join(map(str, numbers))), out=out)
+        self.assertEqual(out.getvalue(), format_hist_data(data, "json"))
+        rows = list(csv.reader(io.StringIO(format_hist_data(data, "csv"))))
+        self.assertEqual(rows[0], ["bin", "count"])
+        self.assertEqual([int(count) for _, count in rows[1:len(bins) + 1]], hist)
+        self.assertEqual(rows[len(bins) + 3], ["observations", "500"])
+
+        rows = ["1,1"] * 50 + ["2,2"] * 5 + ["3,3"]
+        data = scatter_data(rows, size=2)
+        self.assertEqual(data["summary"]["points"], 56)
+        self.assertEqual(data["summary"]["occupied_cells"], 3)
+        self.assertEqual(sorted(count for row in data["counts"] for count in row if count), [1, 5, 50])
+        out = io.StringIO()
+        scatterplot.run(["-s", "2", "--format", "csv"], stdin=iter(rows), out=out)
+        self.assertEqual(out.getvalue(), format_scatter_data(data, "csv"))
+        self.assertIn("\nstatistic,value\npoints,56\n", out.getvalue())
+
+    def testServer(self):
+        sock_dir = tempfile.mkdtemp()
+        path = os.path.join(sock_dir, "plot.sock")
+        plot_server = server.PlotServer(path, server.PlotHandler)
+        thread = threading.Thread(target=plot_server.serve_forever)
+        thread.start()
+        try:
+            numbers = "\n".join(str(i % 11) for i in range(300))
+            out, err = io.BytesIO(), io.BytesIO()
+            status = client.request(client.connect(path), ["hist", "-b", "5"], io.BytesIO(numbers.encode()), out, err)
+            self.assertEqual(status, 0)
+            self.assertEqual(out.getvalue().decode(),
+                             render_hist(numbers.split(), height=None, bincount=5, showSummary=True))
+            status = client.request(client.connect(path), ["hist", "--bogus"], None, out, err)
+            self.assertEqual(status, 2)
+            self.assertIn(b"no such option: --bogus", err.getvalue())
+            self.assertEqual(os.stat(path).st_mode & 0o077, 0)
+
+            # a client still sending its stdin does not hold up the others
+            streaming = client.connect(path)
+            client.write_frame(streaming, b'a', "\0".join([os.getcwd(), "hist"]).encode())
+            streaming.sendall(b"1\n2\n")
+            try:
+                sock, out = client.connect(path), io.BytesIO()
+                sock.settimeout(10)
+                status = client.request(sock, ["hist", "-b", "5"], io.BytesIO(numbers.encode()), out, io.BytesIO())
+                self.assertEqual(status, 0)
+                self.assertEqual(out.getvalue().decode(),
+                                 render_hist(numbers.split(), height=None, bincount=5, showSummary=True))
+            finally:
+                streaming.close()
+
+            # files are found in the client's directory, the server's stays put
+            with open(os.path.join(sock_dir, "numbers.txt"), 'w') as fh:
+                fh.write(numbers)
+            cwd, out = os.getcwd(), io.StringIO()
+            status = server.run_command(sock_dir, ["hist", "-b", "5", "--cache-dir", "cache", "numbers.txt"],
+                                        None, out, io.StringIO())
+            self.assertEqual(status, 0)
+            self.assertEqual(os.getcwd(), cwd)
+            self.assertTrue(os.path.isdir(os.path.join(sock_dir, "cache")))
+            self.assertEqual(out.getvalue(), render_hist(numbers.split(), height=None, bincount=5, showSummary=True))
+        finally:
+            plot_server.shutdown()
+            plot_server.server_close()
+            thread.join()
+            shutil.rmtree(sock_dir)
+
+    def testRenderCache(self):
+        cache_dir = tempfile.mkdtemp()
+        path = os.path.join(cache_dir, "numbers.txt")
+        with open(path, 'w') as fh:
+            fh.write("\n".join(str(i % 13) for i in range(500)))
+        try:
+            cache = RenderCache(directory=os.path.join(cache_dir, "cache"))
+            expected = render_hist(path, bincount=6, showSummary=True)
+            self.assertEqual(render_hist(path, bincount=6, showSummary=True, cache=cache), expected)
+            self.assertEqual(render_hist(path, bincount=6, showSummary=True, cache=cache), expected)
+            self.assertEqual(cache.hits, 1)
+            # the counts are shared with other layouts of the same bins
+            self.assertEqual(render_horiz_hist(path, bincount=6, cache=cache),
+                             render_horiz_hist(path, bincount=6))
+            self.assertEqual(cache.hits, 2)
+
+            # a fresh cache on the same directory answers from disk
+            cache = RenderCache(directory=cache.directory)
+            self.assertEqual(render_hist(path, bincount=6, showSummary=True, cache=cache), expected)
+            self.assertEqual(cache.hits, 1)
+
+            # changing the file changes the key
+            with open(path, 'a') as fh:
+                fh.write("\n40")
+            os.utime(path, (0, 0))
+            self.assertNotEqual(render_hist(path, bincount=6, showSummary=True, cache=cache), expected)
+            self.assertEqual(cache.hits, 1)
+            self.assertIsNone(cache.key("hist", ["1", "2"], ()))
+
+            # threads storing and reading the same keys through one directory
+            shared = os.path.join(cache_dir, "shared")
+            caches = [RenderCache(directory=shared) for _ in range(4)]
+
+            def hammer(i):
+                cache = caches[i % 4]
+                for j in range(60):
+                    key = "k%d" % (j % 3)
+                    cache.put(key, {"values": list(range(200)), "by": i})
+                    with cache.lock:
+                        cache.entries.clear()
+                    value = cache.get(key)
+                    self.assertTrue(value is None or len(value["values"]) == 200)
+            with ThreadPoolExecutor(16) as pool:
+                list(pool.map(hammer, range(16)))
+            self.assertEqual(sorted(os.listdir(shared)), ["k0.json", "k1.json", "k2.json"])
+            with open(os.path.join(shared, "k0.json"), 'w') as fh:
+                fh.write('{"values": [1, 2')
+            self.assertIsNone(RenderCache(directory=shared).get("k0"))
+
+            cache = RenderCache(max_entries=2)
+            for size in (10, 11, 12):
+                render_scatter(None, path, path, size, "x", "default", "", cache=cache)
+            self.assertEqual(len(cache.entries), 2)
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+class ReaderTestCase(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as fh:
+            fh.write("1.5,-2\n3,4e2\n\n-0.25,7\n12,13")
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testColumnChunks(self):
+        for chunk_size in (1, 5, 1 << 20):
+            xs, ys = [], []
+            for x_chunk, y_chunk in iter_column_chunks(self.path, (0, 1), chunk_size=chunk_size):
+                xs.extend(x_chunk)
+                ys.extend(y_chunk)
+            self.assertEqual(xs, [1.5, 3, -0.25, 12])
+            self.assertEqual(ys, [-2, 400, 7, 13])
+
+    def testParallelFiles(self):
+        rng = random.Random(3)
+        paths = []
+        for i in range(3):
+            fd, path = tempfile.mkstemp(suffix=".txt")
+            with os.fdopen(fd, 'w') as fh:
+                fh.write("\n".join(str(rng.gauss(0, 10)) for _ in range(500)) + "\n")
+            paths.append(path)
+        try:
+            numbers = [x for path in paths for x in read_numbers(path)]
+            bins, hist, stats = histogram_counts(numbers)
+            par_bins, par_hist, par_stats = histogram_counts_files(paths, jobs=2, split_size=997)
+            self.assertEqual(bins, par_bins)
+            self.assertEqual(hist, par_hist)
+            self.assertEqual(stats.n, par_stats.n)
+            self.assertAlmostEqual(stats.sd, par_stats.sd)
+            self.assertRaises(ValueError, histogram_counts, paths, jobs=2, backend="numpy")
+            for argv in (paths, [paths[0], "-j", "2"], ["--sketch", paths[0]]):
+                err = io.StringIO()
+                self.assertRaises(SystemExit, histogram.parse_args, argv + ["--backend", "numpy"], err=err)
+                self.assertIn("--backend numpy", err.getvalue())
+        finally:
+            for path in paths:
+                os.remove(path)
+
+    def testNumberChunks(self):
+        with open(self.path, 'w') as fh:
+            fh.write("\n".join(str(i) for i in range(100)))
+        for chunk_size in (3, 64, 1 << 20):
+            numbers = [x for chunk in iter_number_chunks(self.path, chunk_size) for x in chunk]
+            self.assertEqual(numbers, list(range(100)))
+
+    def testWeightedAndBinaryInput(self):
+        numbers = [float(i % 7) for i in range(200)]
+        bins, hist, stats = histogram_counts(numbers)
+
+        with open(self.path, 'w') as fh:
+            fh.write("".join("%d,%d\n" % (v, numbers.count(v)) for v in sorted(set(numbers))))
+        w_bins, w_hist, w_stats = histogram_counts(self.path, input_format="weighted")
+        self.assertEqual((bins, hist, stats.n), (w_bins, w_hist, w_stats.n))
+        self.assertAlmostEqual(stats.mean, w_stats.mean)
+        self.assertAlmostEqual(stats.sd, w_stats.sd)
+
+        with open(self.path, 'wb') as fh:
+            fh.write(struct.pack('<%dd' % len(numbers), *numbers))
+        self.assertEqual(histogram_counts(self.path, input_format="f64")[1], hist)
+        with open(self.path, 'rb') as fh:
+            self.assertEqual(histogram_counts(fh, input_format="f64")[1], hist)
+
+
 if __name__ == "__main__":
     unittest.main() # run all tests